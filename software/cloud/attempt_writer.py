@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger("wand-brain-cloud")
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class BatchWriter:
+    """
+    Background writer that persists queued items in batches.
+
+    put() never blocks on the database: items are appended to an in-memory
+    queue and a single thread hands everything queued (up to `max_batch`) to
+    `write_batch`, which is expected to write the batch in one transaction.
+    Items with the same key are coalesced; `merge(old, new)` decides what
+    the surviving item looks like. When `write_batch` fails, the batch is
+    retried one item at a time so a single bad row can't drop the others.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[list[Any]], None],
+        key: Callable[[Any], Hashable],
+        merge: Callable[[Any, Any], Any] = lambda old, new: new,
+        max_batch: int = 256,
+        max_wait_ms: int = 50,
+    ):
+        self.write_batch = write_batch
+        self.key = key
+        self.merge = merge
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0, max_wait_ms) / 1000.0
+
+        # key -> (item, enqueued_at_ms); `_order` keeps first-enqueue order
+        self._pending: dict[Hashable, tuple[Any, int]] = {}
+        self._order: deque = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: threading.Thread | None = None
+        self._enqueued_seq = 0
+        self._written_seq = 0
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.last_batch_lag_ms: int | None = None
+        self.max_batch_lag_ms = 0
+        self.last_commit_ms: int | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            self._stop = False
+        self._thread = threading.Thread(target=self._run, name="attempt-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Writes everything still queued, then stops the thread."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def put(self, item: Any) -> None:
+        k = self.key(item)
+        with self._cond:
+            self.enqueued += 1
+            self._enqueued_seq += 1
+            current = self._pending.get(k)
+            if current is None:
+                self._pending[k] = (item, _now_ms())
+                self._order.append(k)
+            else:
+                self.coalesced += 1
+                self._pending[k] = (self.merge(current[0], item), current[1])
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until everything put() so far has been written (or failed)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self._enqueued_seq
+            self._cond.notify_all()
+            while self._written_seq < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._thread is None or not self._thread.is_alive():
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._cond:
+            oldest = self._pending[self._order[0]][1] if self._order else None
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "depth": len(self._pending),
+                "lag_ms": 0 if oldest is None else max(0, _now_ms() - oldest),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+                "max_batch": self.max_batch,
+                "max_batch_seen": self.max_batch_seen,
+                "last_batch_lag_ms": self.last_batch_lag_ms,
+                "max_batch_lag_ms": self.max_batch_lag_ms,
+                "last_commit_ms": self.last_commit_ms,
+            }
+
+    def _take_batch(self) -> tuple[list[Any], int, int]:
+        """Pops up to max_batch items; returns them, the oldest enqueue time and seq covered."""
+        batch, oldest = [], None
+        while self._order and len(batch) < self.max_batch:
+            item, enqueued_at = self._pending.pop(self._order.popleft())
+            batch.append(item)
+            oldest = enqueued_at if oldest is None else min(oldest, enqueued_at)
+        seq = self._enqueued_seq if not self._order else self._written_seq
+        return batch, oldest or _now_ms(), seq
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._order and not self._stop:
+                    self._cond.wait()
+                if not self._order:
+                    return
+                if not self._stop and len(self._order) < self.max_batch and self.max_wait_s:
+                    # Give a burst of finalizes a moment to land in the same transaction.
+                    self._cond.wait(self.max_wait_s)
+                batch, oldest, seq = self._take_batch()
+
+            written, failed = self._write(batch)
+            now = _now_ms()
+            with self._cond:
+                self.written += written
+                self.failed += failed
+                self.batches += 1
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.last_batch_lag_ms = now - oldest
+                self.max_batch_lag_ms = max(self.max_batch_lag_ms, self.last_batch_lag_ms)
+                self.last_commit_ms = now
+                self._written_seq = max(self._written_seq, seq)
+                self._cond.notify_all()
+
+    def _write(self, batch: list[Any]) -> tuple[int, int]:
+        try:
+            self.write_batch(batch)
+            return len(batch), 0
+        except Exception as exc:
+            logger.warning(
+                "Batch write of %s attempts failed, retrying one by one: %s", len(batch), exc
+            )
+        written = 0
+        for item in batch:
+            try:
+                self.write_batch([item])
+                written += 1
+            except Exception as exc:
+                logger.warning("Failed to persist %s: %s", self.key(item), exc)
+        return written, len(batch) - written
@@ -1,17 +1,35 @@
-from fastapi import FastAPI, HTTPException, Path, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path as FSPath
-from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Optional
+from PIL import Image
+import numpy as np
+from dataclasses import asdict, dataclass, field
+from itertools import groupby
+from typing import Dict, List, Optional
+import heapq
+import io
 import os
+import re
 import threading
 import time
 
 from brain.ingest.udp_rx import UdpReceiver
-from brain.ingest.parser import parse_packet, PointEvent
-from brain.render.rasterize import rasterize
-from brain.scoring import list_templates, compute_score
+from brain.ingest.work_queue import BoundedWorkQueue, DROP_OLDEST
+from brain.ingest.parser import WB_LEN, parse_packet, parse_packets_batch, PointEvent
+from brain.core.points import PointRing, to_q15
+from brain.render.image_cache import EncodedImage, EncodedImageCache, encode_png
+from brain.render.rasterize import IncrementalCanvas
+from brain.scoring import (
+    SCORE_METHODS,
+    LiveScore,
+    ScoreCache,
+    TemplateBank,
+    cloud_from_points,
+    image_to_bin,
+)
+from brain.scoring.pool import ScoringPool
 
 # ----------------------------
 # App + constants
@@ -28,26 +46,72 @@ app.add_middleware(
 SERVICE_NAME = "wand-brain"
 SERVICE_VERSION = "0.1.0"
 IDLE_FINALIZE_MS = max(250, int(os.getenv("WB_IDLE_FINALIZE_MS", "1500")))
-IDLE_SWEEP_INTERVAL_MS = max(50, int(os.getenv("WB_IDLE_SWEEP_INTERVAL_MS", "120")))
+# Upper bound on how long the idle sweeper sleeps; it normally wakes at the next deadline.
+IDLE_SWEEP_INTERVAL_MS = max(50, int(os.getenv("WB_IDLE_SWEEP_INTERVAL_MS", "1000")))
 INTERNAL_ATTEMPT_ID_BASE = max(1_000_000_000, int(os.getenv("WB_ATTEMPT_ID_BASE", "1000000000")))
 MIN_POINTS_TO_KEEP = max(1, int(os.getenv("WB_MIN_POINTS_TO_KEEP", "2")))
+MAX_ATTEMPT_POINTS = 5000
+UDP_BATCH_SIZE = max(1, int(os.getenv("WB_UDP_BATCH_SIZE", "256")))
+UDP_RCVBUF_BYTES = max(0, int(os.getenv("WB_UDP_RCVBUF_BYTES", str(4 * 1024 * 1024))))
+INGEST_QUEUE_MAX = max(1, int(os.getenv("WB_INGEST_QUEUE_MAX", "8192")))
+INGEST_DROP_POLICY = os.getenv("WB_INGEST_DROP_POLICY", DROP_OLDEST)
+IMAGE_CACHE_BYTES = max(0, int(os.getenv("WB_IMAGE_CACHE_BYTES", str(32 * 1024 * 1024))))
+TEMPLATE_RECHECK_MS = max(0, int(os.getenv("WB_TEMPLATE_RECHECK_MS", "1000")))
+SCORE_CACHE_SIZE = max(1, int(os.getenv("WB_SCORE_CACHE_SIZE", "512")))
+# Fully score only the best K templates by coarse signature; 0 scores all of them.
+SCORE_TOP_K = max(0, int(os.getenv("WB_SCORE_TOP_K", "0")))
+# Default engine for /api/v2/score/*, one of SCORE_METHODS.
+SCORE_METHOD = os.getenv("WB_SCORE_METHOD", "raster")
+CLOUD_POINTS = max(8, int(os.getenv("WB_CLOUD_POINTS", "32")))
+# Score in this many worker processes instead of in the server; 0 keeps scoring in-process.
+SCORE_WORKERS = max(0, int(os.getenv("WB_SCORE_WORKERS", "0")))
+# Outstanding pool requests before callers wait; 0 means 2 per worker.
+SCORE_MAX_IN_FLIGHT = max(0, int(os.getenv("WB_SCORE_MAX_IN_FLIGHT", "0")))
 
 OUTDIR = FSPath("data/outputs")
 OUTDIR.mkdir(parents=True, exist_ok=True)
 TEMPLATES_DIR = FSPath("data/templates")
 TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
-
-Point = Tuple[float, float, int]  # (x, y, timestamp_ms)
+# Compiled (memory-mappable) copy of the template bank; rebuilt by the compile/upload endpoints.
+TEMPLATE_BANK_FILE = FSPath(os.getenv("WB_TEMPLATE_BANK_FILE", "data/template_bank.wbt"))
+TEMPLATE_UPLOAD_MAX_BYTES = 4 * 1024 * 1024
+TEMPLATE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Binarized templates, kept in memory and reloaded only when the directory changes.
+template_bank = TemplateBank(
+    TEMPLATES_DIR,
+    recheck_ms=TEMPLATE_RECHECK_MS,
+    cloud_points=CLOUD_POINTS,
+    compiled_path=TEMPLATE_BANK_FILE,
+)
+# Serializes compiles so concurrent uploads can't interleave their rebuilds.
+template_compile_lock = threading.Lock()
+# Score payloads keyed by (attempt_id, template_id, top_k, method, template bank version).
+score_cache = ScoreCache(SCORE_CACHE_SIZE)
+scoring_pool: Optional[ScoringPool] = None
+if SCORE_WORKERS:
+    scoring_pool = ScoringPool(
+        TEMPLATES_DIR,
+        workers=SCORE_WORKERS,
+        max_in_flight=SCORE_MAX_IN_FLIGHT or None,
+        recheck_ms=TEMPLATE_RECHECK_MS,
+        cloud_points=CLOUD_POINTS,
+        compiled_path=TEMPLATE_BANK_FILE.resolve(),
+    )
 
 # ----------------------------
 # Models
 # ----------------------------
 @dataclass
 class AttemptBuffer:
-    points: List[Point] = field(default_factory=list)
+    # most recent MAX_ATTEMPT_POINTS points of the attempt
+    points: PointRing = field(default_factory=lambda: PointRing(MAX_ATTEMPT_POINTS))
+    # live canvas; only points added since the last render get drawn onto it
+    canvas: IncrementalCanvas = field(default_factory=lambda: IncrementalCanvas(size=256, stroke=3))
     last_live_render_ms: int = 0
     last_arrival_ms: int = 0
     source_stroke_id: int = 0
+    # running score against the attempt's target template, if it has one
+    live_score: Optional[LiveScore] = None
 
 @dataclass
 class FinalResult:
@@ -66,6 +130,14 @@ class FinalResult:
     best_template_id: Optional[str] = None
     best_template_name: Optional[str] = None
     score: Optional[float] = None
+    # the rendered attempt, handed to finalize hooks (e.g. scoring) so they
+    # don't re-read render_path; released once finalize returns
+    raster: Optional[Image.Image] = field(default=None, repr=False, compare=False)
+    # resampled, normalized stroke points for the point-cloud scorer
+    cloud: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    # the binarized drawing (image_to_bin), bit-packed along each row; /score
+    # reads it instead of decoding render_path again
+    mask: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
 
 @dataclass
 class WandStatus:
@@ -80,42 +152,82 @@ class WandStatus:
     last_finalized_attempt_id: Optional[int] = None
     last_close_reason: Optional[str] = None
     last_stroke_duration_ms: Optional[int] = None
+    # score of the active attempt so far, as of the last live render
+    live_template_id: Optional[str] = None
+    live_score: Optional[float] = None
+
+@dataclass
+class WandShard:
+    """Per-wand slice of BrainState. Everything in it is guarded by `lock`."""
+    status: WandStatus
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    # key: (device, wand, attempt_id)
+    attempts: Dict[tuple[int, int, int], AttemptBuffer] = field(default_factory=dict)
+    # status payload as of the last completed update; readers use this so they
+    # never wait on a wand that is busy rendering or finalizing
+    published: dict = field(default_factory=dict)
 
 class BrainState:
     def __init__(self):
+        # Global lock: attempt-id allocation, creating shards and the cross-wand
+        # indexes below. Only held for short dict updates; per-wand work
+        # (rendering, finalize) runs under that wand's WandShard.lock instead.
         self.lock = threading.RLock()
         self.idle_finalize_ms = IDLE_FINALIZE_MS
-        # key: (device, wand, attempt_id)
-        self.attempts: Dict[tuple[int, int, int], AttemptBuffer] = {}
+        # per-wand state, keyed by wand_id (MVP assumes wand_id unique in system)
+        self.shards: Dict[int, WandShard] = {}
         # latest finalized per (device, wand)
         self.last_result: Dict[tuple[int, int], FinalResult] = {}
         # index for image lookup by (wand_id, attempt_id) for MVP web API
         self.attempt_index: Dict[int, FinalResult] = {}
-        # live status per wand_id (MVP assumes wand_id unique in system)
-        self.wand_status: Dict[int, WandStatus] = {}
-        # latest live-rendered path per wand_id while attempt is active
-        self.live_render_path: Dict[int, str] = {}
+        # encoded PNGs: ("live", wand_id) is the latest live or final render of
+        # the wand, ("attempt", attempt_id) a finalized attempt
+        self.images = EncodedImageCache(IMAGE_CACHE_BYTES)
         self.last_event: Optional[PointEvent] = None
         self._attempt_counter = INTERNAL_ATTEMPT_ID_BASE - 1
+        # Min-heap of (deadline_ms, wand_id, attempt_id), one entry per active
+        # attempt. Entries are invalidated lazily: new points only bump
+        # buf.last_arrival_ms, and a popped entry that is stale or not yet due
+        # is dropped or re-pushed with its real deadline.
+        self._idle_deadlines: List[tuple[int, int, int]] = []
+        self._idle_cond = threading.Condition()
+
+    def live_template_for(self, device_number: int, wand_id: int, attempt_id: int) -> Optional[str]:
+        """
+        Template a new attempt is live-scored against; None disables live
+        scoring. Apps with per-wand targets replace this (see cloud main.py).
+        """
+        return None
+
+    def _shard(self, wand_id: int) -> WandShard:
+        shard = self.shards.get(wand_id)
+        if shard is None:
+            with self.lock:
+                shard = self.shards.get(wand_id)
+                if shard is None:
+                    ws = WandStatus(
+                        wand_id=wand_id,
+                        active=False,
+                        current_attempt_id=None,
+                        last_point_ms=None,
+                    )
+                    shard = WandShard(status=ws)
+                    shard.published = _wand_status_payload(ws)
+                    self.shards[wand_id] = shard
+        return shard
 
     def _ensure_wand(self, device_number: int, wand_id: int) -> WandStatus:
-        ws = self.wand_status.get(wand_id)
-        if ws is None:
-            ws = WandStatus(
-                wand_id=wand_id,
-                active=False,
-                current_attempt_id=None,
-                last_point_ms=None,
-                device_number=device_number,
-            )
-            self.wand_status[wand_id] = ws
-        else:
-            ws.device_number = device_number
+        ws = self._shard(wand_id).status
+        ws.device_number = device_number
         return ws
 
+    def _publish_locked(self, shard: WandShard):
+        shard.published = _wand_status_payload(shard.status)
+
     def _next_attempt_id(self) -> int:
-        self._attempt_counter += 1
-        return self._attempt_counter
+        with self.lock:
+            self._attempt_counter += 1
+            return self._attempt_counter
 
     def _resolve_attempt_id(self, ws: WandStatus, ev: PointEvent) -> int:
         source_stroke_id = ev.stroke_id or None
@@ -134,10 +246,13 @@ class BrainState:
 
     def on_event(self, ev: PointEvent):
         now_ms = int(time.time() * 1000)
-        with self.lock:
-            self._finalize_idle_attempts_locked(now_ms)
-            self.last_event = ev
+        # Finalize whatever is already past its idle deadline; shards that are
+        # busy are left to the IdleAttemptFinalizer rather than waited on.
+        self._finalize_idle_attempts(now_ms, blocking=False)
+        self.last_event = ev
 
+        shard = self._shard(ev.wand_id)
+        with shard.lock:
             ws = self._ensure_wand(ev.device_number, ev.wand_id)
             ws.last_point_ms = ev.timestamp_ms
 
@@ -149,7 +264,7 @@ class BrainState:
                 attempt_id = self._resolve_attempt_id(ws, ev)
 
                 if ws.active and ws.current_attempt_id is not None and ws.current_attempt_id != attempt_id:
-                    self._finalize_locked(
+                    self._close_attempt_locked(
                         ws.device_number or ev.device_number,
                         ev.wand_id,
                         ws.current_attempt_id,
@@ -164,41 +279,73 @@ class BrainState:
             if ev.stroke_end:
                 attempt_id = ws.current_attempt_id
                 if attempt_id is not None:
-                    self._finalize_locked(
+                    self._close_attempt_locked(
                         ev.device_number,
                         ev.wand_id,
                         attempt_id,
                         close_reason="explicit_end",
                     )
 
+            self._publish_locked(shard)
+
     def _add_point_locked(self, ev: PointEvent, attempt_id: int, arrival_ms: int):
+        shard = self._shard(ev.wand_id)
         key = (ev.device_number, ev.wand_id, attempt_id)
-        buf = self.attempts.setdefault(key, AttemptBuffer())
-        buf.points.append((ev.x, ev.y, ev.timestamp_ms))
+        buf = shard.attempts.get(key)
+        if buf is None:
+            buf = shard.attempts[key] = AttemptBuffer()
+            self._schedule_idle_deadline(arrival_ms + self.idle_finalize_ms, ev.wand_id, attempt_id)
+            buf.live_score = self._new_live_score(ev.device_number, ev.wand_id, attempt_id, buf)
+            shard.status.live_template_id = (
+                None if buf.live_score is None else buf.live_score.template.template_id
+            )
+            shard.status.live_score = None
+        buf.points.append(to_q15(ev.x), to_q15(ev.y), ev.timestamp_ms)
         buf.last_arrival_ms = arrival_ms
         if ev.stroke_id:
             buf.source_stroke_id = ev.stroke_id
-        if len(buf.points) > 5000:
-            buf.points = buf.points[-5000:]
-        ws = self.wand_status.get(ev.wand_id)
-        if ws is not None:
-            if len(buf.points) == 1:
-                ws.current_start_ms = ev.timestamp_ms
-            ws.current_points = len(buf.points)
+        ws = shard.status
+        if len(buf.points) == 1:
+            ws.current_start_ms = ev.timestamp_ms
+        ws.current_points = len(buf.points)
         self._render_live_if_due(ev.wand_id, buf)
 
     def _render_live_if_due(self, wand_id: int, buf: AttemptBuffer, interval_ms: int = 80):
         now_ms = int(time.time() * 1000)
-        # Render first point quickly, then throttle to avoid excessive I/O.
+        # Render first point quickly, then throttle PNG encoding.
         if buf.last_live_render_ms and (now_ms - buf.last_live_render_ms) < interval_ms:
             return
-        img = rasterize(buf.points, size=256, stroke=3, normalize_view=False)
-        live_path = OUTDIR / f"wand_{wand_id}_live.png"
-        tmp_path = OUTDIR / f".wand_{wand_id}_live.tmp.png"
-        img.save(tmp_path)
-        os.replace(tmp_path, live_path)
-        self.live_render_path[wand_id] = str(live_path)
+        img = buf.canvas.update(buf.points.x_q, buf.points.y_q, buf.points.total)
+        self.images.put(("live", wand_id), encode_png(img))
         buf.last_live_render_ms = now_ms
+        if buf.live_score is not None:
+            buf.live_score.update(img, buf.canvas.dirty, buf.canvas.cleared)
+            self._shard(wand_id).status.live_score = buf.live_score.result().score
+
+    def _new_live_score(
+        self,
+        device: int,
+        wand: int,
+        attempt_id: int,
+        buf: AttemptBuffer,
+    ) -> Optional[LiveScore]:
+        template_id = self.live_template_for(device, wand, attempt_id)
+        template = template_bank.get(template_id) if template_id else None
+        if template is None or template_bank.size != buf.canvas.size:
+            return None
+        return LiveScore(template, size=template_bank.size, threshold=template_bank.threshold)
+
+    def _close_attempt_locked(
+        self,
+        device: int,
+        wand: int,
+        attempt_id: int,
+        close_reason: str,
+    ) -> Optional[FinalResult]:
+        res = self._finalize_locked(device, wand, attempt_id, close_reason=close_reason)
+        if res is not None:
+            res.raster = None  # the encoded PNG stays available in self.images
+        return res
 
     def _finalize_locked(
         self,
@@ -207,31 +354,35 @@ class BrainState:
         attempt_id: int,
         close_reason: str,
     ) -> Optional[FinalResult]:
+        shard = self._shard(wand)
         key = (device, wand, attempt_id)
-        buf = self.attempts.get(key)
+        buf = shard.attempts.get(key)
+        ws = shard.status
         if buf is None or not buf.points:
-            self.attempts.pop(key, None)
-            ws = self.wand_status.get(wand)
-            if ws is not None and ws.current_attempt_id == attempt_id:
+            shard.attempts.pop(key, None)
+            if ws.current_attempt_id == attempt_id:
                 ws.active = False
                 ws.current_attempt_id = None
                 ws.current_source_stroke_id = None
                 ws.current_start_ms = None
                 ws.current_points = 0
+                ws.live_template_id = None
+                ws.live_score = None
                 ws.last_finalized_attempt_id = attempt_id
                 ws.last_close_reason = close_reason
             return None
 
         pts = buf.points
         if len(pts) < MIN_POINTS_TO_KEEP and close_reason != "explicit_end":
-            self.attempts.pop(key, None)
-            ws = self.wand_status.get(wand)
-            if ws is not None and ws.current_attempt_id == attempt_id:
+            shard.attempts.pop(key, None)
+            if ws.current_attempt_id == attempt_id:
                 ws.active = False
                 ws.current_attempt_id = None
                 ws.current_source_stroke_id = None
                 ws.current_start_ms = None
                 ws.current_points = 0
+                ws.live_template_id = None
+                ws.live_score = None
                 ws.last_finalized_attempt_id = attempt_id
                 ws.last_close_reason = f"{close_reason}_discarded"
             return None
@@ -240,9 +391,17 @@ class BrainState:
         end_ms = pts[-1][2]
         finalized_at_ms = int(time.time() * 1000)
 
-        img = rasterize(pts, size=256, stroke=3, normalize_view=False)
+        # Reuse the live canvas: only points since the last live tick are drawn.
+        # Once points have rotated out of the ring the canvas still shows them,
+        # so it is redrawn from the ring to cover the same points as
+        # num_points and start_ms.
+        if pts.total > len(pts):
+            img = buf.canvas.redraw(pts.x_q, pts.y_q, pts.total)
+        else:
+            img = buf.canvas.update(pts.x_q, pts.y_q, pts.total)
+        encoded = encode_png(img)
         out_path = OUTDIR / f"dev{device}_wand{wand}_attempt{attempt_id}_{finalized_at_ms}.png"
-        img.save(out_path)
+        out_path.write_bytes(encoded.data)
 
         res = FinalResult(
             device_number=device,
@@ -255,59 +414,129 @@ class BrainState:
             finalized_at_ms=finalized_at_ms,
             render_path=str(out_path),
             close_reason=close_reason,
+            raster=img,
+            cloud=cloud_from_points(pts.x_q, pts.y_q, n=CLOUD_POINTS),
+            mask=np.packbits(image_to_bin(img), axis=-1),
         )
 
-        self.last_result[(device, wand)] = res
-        self.attempt_index[attempt_id] = res  # MVP lookup by wand+attempt
-        self.live_render_path[wand] = str(out_path)
-        self.attempts.pop(key, None)
-        ws = self.wand_status.get(wand)
-        if ws is not None and ws.current_attempt_id == attempt_id:
+        with self.lock:
+            self.last_result[(device, wand)] = res
+            self.attempt_index[attempt_id] = res  # MVP lookup by wand+attempt
+        self.images.put(("attempt", attempt_id), encoded)
+        self.images.put(("live", wand), encoded)
+        shard.attempts.pop(key, None)
+        if ws.current_attempt_id == attempt_id:
             ws.active = False
             ws.current_attempt_id = None
             ws.current_source_stroke_id = None
             ws.current_start_ms = None
             ws.current_points = 0
+            ws.live_template_id = None
+            ws.live_score = None
             ws.last_finalized_attempt_id = attempt_id
             ws.last_close_reason = close_reason
             ws.last_stroke_duration_ms = max(0, end_ms - start_ms)
         return res
 
-    def _finalize_idle_attempts_locked(self, now_ms: int):
-        for wand_id, ws in list(self.wand_status.items()):
-            if not ws.active or ws.current_attempt_id is None or ws.device_number is None:
-                continue
+    def _schedule_idle_deadline(self, deadline_ms: int, wand_id: int, attempt_id: int):
+        with self._idle_cond:
+            entry = (deadline_ms, wand_id, attempt_id)
+            heapq.heappush(self._idle_deadlines, entry)
+            if self._idle_deadlines[0] == entry:
+                # New earliest deadline: wake the sweeper so it can re-arm.
+                self._idle_cond.notify_all()
+
+    def _pop_due_idle_deadlines(self, now_ms: int) -> List[tuple[int, int, int]]:
+        due = []
+        with self._idle_cond:
+            while self._idle_deadlines and self._idle_deadlines[0][0] <= now_ms:
+                due.append(heapq.heappop(self._idle_deadlines))
+        return due
+
+    def _finalize_idle_attempt_locked(self, shard: WandShard, attempt_id: int, now_ms: int):
+        ws = shard.status
+        if not ws.active or ws.current_attempt_id != attempt_id or ws.device_number is None:
+            return  # stale entry: attempt already finalized or replaced
+
+        key = (ws.device_number, ws.wand_id, attempt_id)
+        buf = shard.attempts.get(key)
+        if buf is None:
+            ws.active = False
+            ws.current_attempt_id = None
+            ws.current_source_stroke_id = None
+            ws.current_start_ms = None
+            ws.current_points = 0
+            ws.live_template_id = None
+            ws.live_score = None
+        elif (now_ms - buf.last_arrival_ms) >= self.idle_finalize_ms:
+            self._close_attempt_locked(
+                ws.device_number,
+                ws.wand_id,
+                attempt_id,
+                close_reason="idle_timeout",
+            )
+        else:
+            self._schedule_idle_deadline(
+                buf.last_arrival_ms + self.idle_finalize_ms,
+                ws.wand_id,
+                attempt_id,
+            )
+            return
+        self._publish_locked(shard)
 
-            key = (ws.device_number, wand_id, ws.current_attempt_id)
-            buf = self.attempts.get(key)
-            if buf is None:
-                ws.active = False
-                ws.current_attempt_id = None
-                ws.current_source_stroke_id = None
-                ws.current_start_ms = None
-                ws.current_points = 0
+    def _finalize_idle_attempts(self, now_ms: int, blocking: bool = True):
+        for deadline_ms, wand_id, attempt_id in self._pop_due_idle_deadlines(now_ms):
+            shard = self.shards.get(wand_id)
+            if shard is None:
                 continue
-
-            if buf.last_arrival_ms and (now_ms - buf.last_arrival_ms) >= self.idle_finalize_ms:
-                self._finalize_locked(
-                    ws.device_number,
-                    wand_id,
-                    ws.current_attempt_id,
-                    close_reason="idle_timeout",
-                )
+            if not shard.lock.acquire(blocking=blocking):
+                self._schedule_idle_deadline(deadline_ms, wand_id, attempt_id)
+                continue
+            try:
+                self._finalize_idle_attempt_locked(shard, attempt_id, now_ms)
+            finally:
+                shard.lock.release()
+
+    def wait_for_idle_deadline(self, max_wait_s: float):
+        """Blocks until the earliest idle deadline is due, an earlier one arrives, or max_wait_s."""
+        with self._idle_cond:
+            wait_s = max_wait_s
+            if self._idle_deadlines:
+                due_in_ms = self._idle_deadlines[0][0] - int(time.time() * 1000)
+                wait_s = min(wait_s, due_in_ms / 1000.0)
+            if wait_s > 0:
+                self._idle_cond.wait(wait_s)
+
+    def wake_idle_waiters(self):
+        with self._idle_cond:
+            self._idle_cond.notify_all()
 
     def finalize_idle_attempts(self):
+        self._finalize_idle_attempts(int(time.time() * 1000))
+
+    def wand_payload(self, wand_id: int) -> Optional[dict]:
+        shard = self.shards.get(wand_id)
+        return None if shard is None else dict(shard.published)
+
+    def wand_payloads(self) -> List[dict]:
         with self.lock:
-            self._finalize_idle_attempts_locked(int(time.time() * 1000))
+            shards = list(self.shards.values())
+        return [dict(shard.published) for shard in shards]
 
     def snapshot(self):
+        with self.lock:
+            shards = list(self.shards.items())
+        buffer_sizes = {}
+        for _wand_id, shard in shards:
+            with shard.lock:
+                buffer_sizes.update({str(k): len(v.points) for k, v in shard.attempts.items()})
         with self.lock:
             return {
                 "idle_finalize_ms": self.idle_finalize_ms,
-                "attempt_buffer_sizes": {str(k): len(v.points) for k, v in self.attempts.items()},
+                "attempt_buffer_sizes": buffer_sizes,
                 "last_event": None if self.last_event is None else self.last_event.__dict__,
                 "last_result_keys": [f"{k[0]},{k[1]}" for k in self.last_result.keys()],
-                "wands": {str(k): self.wand_status[k].__dict__ for k in self.wand_status},
+                "wands": {str(k): shard.published for k, shard in shards},
             }
 
 state = BrainState()
@@ -325,6 +554,7 @@ def _wand_status_payload(ws: WandStatus) -> dict:
 class IdleAttemptFinalizer:
     def __init__(self, state: BrainState, interval_ms: int = IDLE_SWEEP_INTERVAL_MS):
         self.state = state
+        # Longest sleep between sweeps; normally the state wakes us at the next deadline.
         self.interval_s = interval_ms / 1000.0
         self._stop = threading.Event()
         self._thread: Optional[threading.Thread] = None
@@ -338,24 +568,62 @@ class IdleAttemptFinalizer:
 
     def stop(self):
         self._stop.set()
+        self.state.wake_idle_waiters()
         if self._thread:
             self._thread.join(timeout=1.0)
 
     def _run(self):
-        while not self._stop.wait(self.interval_s):
+        while not self._stop.is_set():
+            self.state.wait_for_idle_deadline(self.interval_s)
+            if self._stop.is_set():
+                break
             self.state.finalize_idle_attempts()
 
+# State processing (renders, finalize hooks) runs on its own worker so a slow
+# render or DB write never stalls the UDP thread.
+ingest_queue = BoundedWorkQueue(
+    handler=state.on_event,
+    maxsize=INGEST_QUEUE_MAX,
+    policy=INGEST_DROP_POLICY,
+)
+
 def on_udp_packet(raw: bytes, addr):
     ev = parse_packet(raw)
     if ev is None:
         return
-    state.on_event(ev)
-
-udp = UdpReceiver(host="0.0.0.0", port=41000, on_packet=on_udp_packet)
+    ingest_queue.put(ev)
+
+def on_udp_batch(batch):
+    # Runs of wb-point-v1 datagrams are decoded together; legacy CSV datagrams
+    # (dev only) are not part of the columnar decode. Either way points are
+    # queued in arrival order.
+    views = (view for view, _addr in batch)
+    for binary, run in groupby(views, key=lambda view: len(view) == WB_LEN):
+        if binary:
+            ingest_queue.put_many(parse_packets_batch(run).events())
+            continue
+        for view in run:
+            ev = parse_packet(bytes(view))
+            if ev is not None:
+                ingest_queue.put(ev)
+
+udp = UdpReceiver(
+    host="0.0.0.0",
+    port=41000,
+    on_packet=on_udp_packet,
+    on_batch=on_udp_batch,
+    batch_size=UDP_BATCH_SIZE,
+    rcvbuf=UDP_RCVBUF_BYTES or None,
+)
 idle_finalizer = IdleAttemptFinalizer(state)
 
 @app.on_event("startup")
 def _startup():
+    if not TEMPLATE_BANK_FILE.exists():
+        _compile_template_bank()
+    if scoring_pool is not None:
+        scoring_pool.start()
+    ingest_queue.start()
     udp.start()
     idle_finalizer.start()
 
@@ -364,6 +632,9 @@ def _startup():
 def _shutdown():
     idle_finalizer.stop()
     udp.stop()
+    ingest_queue.stop()
+    if scoring_pool is not None:
+        scoring_pool.stop()
 
 # ----------------------------
 # Existing endpoints (dev)
@@ -374,7 +645,13 @@ def health():
 
 @app.get("/v1/debug/state")
 def debug_state():
-    return state.snapshot()
+    snap = state.snapshot()
+    snap["udp"] = asdict(udp.stats)
+    snap["ingest_queue"] = ingest_queue.snapshot()
+    snap["image_cache"] = state.images.snapshot()
+    snap["score_cache"] = score_cache.snapshot()
+    snap["scoring_pool"] = None if scoring_pool is None else scoring_pool.snapshot()
+    return snap
 
 # ----------------------------
 # WEB CONTRACT: /api/v1/* (exact 5)
@@ -395,8 +672,7 @@ def api_health():
 @app.get("/api/v1/wands")
 def api_wands():
     now_ms = int(time.time() * 1000)
-    with state.lock:
-        wands = [_wand_status_payload(ws) for ws in state.wand_status.values()]
+    wands = state.wand_payloads()
     return {
         "time_ms": now_ms,
         "wands": wands,
@@ -405,10 +681,8 @@ def api_wands():
 # 3) /api/v1/wand/{wand_id}
 @app.get("/api/v1/wand/{wand_id}")
 def api_wand(wand_id: int = Path(..., ge=1)):
-    with state.lock:
-        ws = state.wand_status.get(wand_id)
-        payload = None if ws is None else _wand_status_payload(ws)
-    if ws is None:
+    payload = state.wand_payload(wand_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="wand not found")
     return payload
 
@@ -444,36 +718,61 @@ def api_attempt_latest(wand_id: int = Query(..., ge=1)):
     res = max(candidates, key=lambda r: r.finalized_at_ms)
     return _attempt_result_payload(res)
 
+def _png_response(image: EncodedImage, if_none_match: Optional[str]) -> Response:
+    headers = {
+        "ETag": image.etag,
+        # Browsers may keep a copy but must revalidate it (If-None-Match) every time.
+        "Cache-Control": "no-cache, must-revalidate, max-age=0",
+        "Pragma": "no-cache",
+        "Expires": "0",
+    }
+    if if_none_match and image.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.data, media_type="image/png", headers=headers)
+
+
+def _png_file_response(render_path: str) -> FileResponse:
+    resp = FileResponse(render_path, media_type="image/png")
+    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+    resp.headers["Pragma"] = "no-cache"
+    resp.headers["Expires"] = "0"
+    return resp
+
+
 # 5) /api/v1/attempt/{attempt_id}/image.png
 @app.api_route("/api/v1/attempt/{attempt_id}/image.png", methods=["GET", "HEAD"])
 def api_attempt_image(
-    attempt_id: int = Path(..., ge=0),):
+    attempt_id: int = Path(..., ge=0),
+    if_none_match: Optional[str] = Header(None),
+):
     with state.lock:
         res = state.attempt_index.get(attempt_id)
     if res is None:
         raise HTTPException(status_code=404, detail="attempt image not found")
-    resp = FileResponse(res.render_path, media_type="image/png")
-    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    resp.headers["Pragma"] = "no-cache"
-    resp.headers["Expires"] = "0"
-    return resp
+    cached = state.images.get(("attempt", attempt_id))
+    if cached is not None:
+        return _png_response(cached, if_none_match)
+    return _png_file_response(res.render_path)
 
 
 @app.api_route("/api/v1/wand/{wand_id}/live.png", methods=["GET", "HEAD"])
-def api_wand_live_image(wand_id: int = Path(..., ge=1)):
+def api_wand_live_image(
+    wand_id: int = Path(..., ge=1),
+    if_none_match: Optional[str] = Header(None),
+):
+    cached = state.images.get(("live", wand_id))
+    if cached is not None:
+        return _png_response(cached, if_none_match)
     with state.lock:
-        render_path = state.live_render_path.get(wand_id)
         candidates = [r for r in state.last_result.values() if r.wand_id == wand_id]
-    if not render_path:
-        # Fallback: serve latest finalized attempt for this wand if available.
-        if not candidates:
-            raise HTTPException(status_code=404, detail="no live image for this wand")
-        render_path = max(candidates, key=lambda r: r.finalized_at_ms).render_path
-    resp = FileResponse(render_path, media_type="image/png")
-    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    resp.headers["Pragma"] = "no-cache"
-    resp.headers["Expires"] = "0"
-    return resp
+    # Fallback: serve latest finalized attempt for this wand if available.
+    if not candidates:
+        raise HTTPException(status_code=404, detail="no live image for this wand")
+    latest = max(candidates, key=lambda r: r.finalized_at_ms)
+    cached = state.images.get(("attempt", latest.attempt_id))
+    if cached is not None:
+        return _png_response(cached, if_none_match)
+    return _png_file_response(latest.render_path)
 
 
 # ----------------------------
@@ -482,7 +781,7 @@ def api_wand_live_image(wand_id: int = Path(..., ge=1)):
 
 @app.get("/api/v2/templates")
 def api_v2_templates():
-    ts = list_templates(TEMPLATES_DIR)
+    ts = template_bank.refs()
     return {
         "count": len(ts),
         "templates": [
@@ -504,6 +803,59 @@ def api_v2_template_image(template_id: str = Path(..., min_length=1)):
     return FileResponse(str(p), media_type="image/png")
 
 
+def _compile_template_bank() -> dict:
+    with template_compile_lock:
+        header = template_bank.compile()
+    return {
+        "bank_id": header["bank_id"],
+        "created_ms": header["created_ms"],
+        "count": len(header["templates"]),
+        "path": str(TEMPLATE_BANK_FILE),
+        "bytes": TEMPLATE_BANK_FILE.stat().st_size,
+    }
+
+
+@app.post("/api/v2/templates/compile")
+def api_v2_compile_templates():
+    return _compile_template_bank()
+
+
+@app.put("/api/v2/template/{template_id}/image.png")
+async def api_v2_upload_template(request: Request, template_id: str = Path(..., min_length=1)):
+    """Adds or replaces a template from a raw image body, then rebuilds the compiled bank."""
+    if not TEMPLATE_ID_RE.match(template_id):
+        raise HTTPException(status_code=400, detail="template_id must be 1-64 of [A-Za-z0-9_-]")
+    body = await request.body()
+    if not body:
+        raise HTTPException(status_code=400, detail="empty body, expected an image")
+    if len(body) > TEMPLATE_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="template image too large")
+    return await run_in_threadpool(_store_template, template_id, body)
+
+
+def _store_template(template_id: str, body: bytes) -> dict:
+    try:
+        img = Image.open(io.BytesIO(body))
+        img.load()
+    except Exception:
+        raise HTTPException(status_code=400, detail="body is not a readable image")
+
+    # Write next to the target and rename, so the bank never sees a partial PNG.
+    path = TEMPLATES_DIR / f"{template_id}.png"
+    tmp = TEMPLATES_DIR / f".{template_id}.{threading.get_ident()}.upload.tmp"
+    img.convert("L").save(tmp, format="PNG")
+    os.replace(tmp, path)
+
+    bank = _compile_template_bank()
+    template = template_bank.get(template_id)
+    return {
+        "template_id": template_id,
+        "name": template.ref.name if template else template_id,
+        "image_png": f"/api/v2/template/{template_id}/image.png",
+        "bank": bank,
+    }
+
+
 def _resolve_attempt_for_scoring(wand_id: Optional[int], attempt_id: Optional[int]) -> FinalResult:
     with state.lock:
         if attempt_id is not None:
@@ -526,42 +878,98 @@ def _resolve_attempt_for_scoring(wand_id: Optional[int], attempt_id: Optional[in
 def api_v2_score_latest(
     wand_id: int = Query(..., ge=1),
     template_id: Optional[str] = Query(None),
+    top_k: Optional[int] = Query(None, ge=0),
+    method: Optional[str] = Query(None),
 ):
     res = _resolve_attempt_for_scoring(wand_id=wand_id, attempt_id=None)
-    return _score_attempt_payload(res, template_id=template_id)
+    return _score_attempt_payload(res, template_id=template_id, top_k=top_k, method=method)
 
 
 @app.get("/api/v2/score/attempt/{attempt_id}")
 def api_v2_score_attempt(
     attempt_id: int = Path(..., ge=0),
     template_id: Optional[str] = Query(None),
+    top_k: Optional[int] = Query(None, ge=0),
+    method: Optional[str] = Query(None),
 ):
     res = _resolve_attempt_for_scoring(wand_id=None, attempt_id=attempt_id)
-    return _score_attempt_payload(res, template_id=template_id)
+    return _score_attempt_payload(res, template_id=template_id, top_k=top_k, method=method)
 
 
-def _score_attempt_payload(res: FinalResult, template_id: Optional[str]):
-    templates = list_templates(TEMPLATES_DIR)
+def _score_attempt_payload(
+    res: FinalResult,
+    template_id: Optional[str],
+    top_k: Optional[int] = None,
+    method: Optional[str] = None,
+):
+    method = method or SCORE_METHOD
+    if method not in SCORE_METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"unknown scoring method, expected one of {list(SCORE_METHODS)}",
+        )
+    templates = template_bank.templates()
     if not templates:
         raise HTTPException(
             status_code=400,
             detail="no templates found in data/templates (expected *.png)",
         )
 
-    if template_id:
-        chosen = next((t for t in templates if t.template_id == template_id), None)
-        if chosen is None:
-            raise HTTPException(status_code=404, detail="template not found")
-        best = compute_score(FSPath(res.render_path), FSPath(chosen.path))
-        candidates = [best]
-    else:
-        candidates = [compute_score(FSPath(res.render_path), FSPath(t.path)) for t in templates]
-        best = max(candidates, key=lambda c: c.score)
+    top_k = SCORE_TOP_K if top_k is None else top_k
+    key = (res.attempt_id, template_id or None, top_k, method, template_bank.version)
+    payload = score_cache.get(key)
+    if payload is None:
+        payload = _compute_score_payload(res, template_id, top_k, method)
+        score_cache.put(key, payload)
 
     # Also write back into last result payload fields for convenience.
-    res.best_template_id = best.template_id
-    res.best_template_name = best.template_name
-    res.score = best.score
+    best = payload["best"]
+    res.best_template_id = best["template_id"]
+    res.best_template_name = best["template_name"]
+    res.score = best["score"]
+    return payload
+
+
+def _draw_mask(res: FinalResult) -> np.ndarray:
+    if res.mask is not None:
+        return np.unpackbits(res.mask, axis=-1).astype(bool)
+    # Results finalized without a mask: fall back to the stored PNG.
+    with Image.open(res.render_path) as img:
+        return image_to_bin(img)
+
+
+def _compute_score_payload(
+    res: FinalResult,
+    template_id: Optional[str],
+    top_k: int,
+    method: str,
+) -> dict:
+    if method == "pointcloud" and res.cloud is None:
+        raise HTTPException(
+            status_code=409,
+            detail="attempt has no point data for pointcloud scoring",
+        )
+    if template_id and template_bank.get(template_id) is None:
+        raise HTTPException(status_code=404, detail="template not found")
+    draw_mask = None if method == "pointcloud" else _draw_mask(res)
+    try:
+        if scoring_pool is None:
+            candidates, pruned = template_bank.evaluate(
+                method, draw_mask=draw_mask, cloud=res.cloud, template_id=template_id, top_k=top_k
+            )
+        else:
+            # Workers reload their banks if they haven't seen what this one has.
+            candidates, pruned = scoring_pool.evaluate(
+                method,
+                draw_mask=draw_mask,
+                cloud=res.cloud,
+                template_id=template_id,
+                top_k=top_k,
+                bank_id=template_bank.fingerprint,
+            )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="template not found")
+    best = candidates[0]
 
     return {
         "attempt_id": res.attempt_id,
@@ -570,6 +978,7 @@ def _score_attempt_payload(res: FinalResult, template_id: Optional[str]):
         "device_number": res.device_number,
         "num_points": res.num_points,
         "close_reason": res.close_reason,
+        "method": method,
         "best": {
             "template_id": best.template_id,
             "template_name": best.template_name,
@@ -583,7 +992,9 @@ def _score_attempt_payload(res: FinalResult, template_id: Optional[str]):
                 "score": c.score,
                 "metrics": c.metrics,
             }
-            for c in sorted(candidates, key=lambda x: x.score, reverse=True)
+            for c in candidates
         ],
+        "templates_scored": len(candidates),
+        "templates_pruned": pruned,
         "attempt_image_png": f"/api/v1/attempt/{res.attempt_id}/image.png",
     }
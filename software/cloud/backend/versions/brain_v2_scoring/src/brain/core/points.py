@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+
+Q15_MAX = 32767
+
+Point = Tuple[float, float, int]  # (x, y, timestamp_ms)
+
+
+def to_q15(v: float) -> int:
+    return int(round(max(0.0, min(1.0, v)) * Q15_MAX))
+
+
+class PointRing:
+    """
+    Fixed-capacity ring of the most recent points, stored column-wise.
+
+    x/y are Q15 int16 and timestamps uint32, as on the wire. Every point is
+    written twice (at i and i + capacity) so the live window is always one
+    contiguous slice: append is O(1) and the column views are zero-copy.
+    """
+
+    def __init__(self, capacity: int = 5000):
+        self.capacity = max(1, capacity)
+        self._x = np.zeros(2 * self.capacity, dtype=np.int16)
+        self._y = np.zeros(2 * self.capacity, dtype=np.int16)
+        self._t = np.zeros(2 * self.capacity, dtype=np.uint32)
+        self._next = 0  # slot the next point goes to, in [0, capacity)
+        self._count = 0
+        self.total = 0  # points ever appended, including ones rotated out
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def append(self, x_q: int, y_q: int, t_ms: int):
+        i = self._next
+        j = i + self.capacity
+        self._x[i] = self._x[j] = x_q
+        self._y[i] = self._y[j] = y_q
+        self._t[i] = self._t[j] = t_ms & 0xFFFFFFFF
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self.total += 1
+
+    def _window(self) -> slice:
+        start = self._next - self._count
+        if start < 0:
+            start += self.capacity
+        return slice(start, start + self._count)
+
+    @property
+    def x_q(self) -> np.ndarray:
+        return self._x[self._window()]
+
+    @property
+    def y_q(self) -> np.ndarray:
+        return self._y[self._window()]
+
+    @property
+    def t_ms(self) -> np.ndarray:
+        return self._t[self._window()]
+
+    def __getitem__(self, index: int) -> Point:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("point index out of range")
+        i = self._window().start + index
+        return (int(self._x[i]) / Q15_MAX, int(self._y[i]) / Q15_MAX, int(self._t[i]))
+
+    def to_points(self) -> List[Point]:
+        w = self._window()
+        xs = (self._x[w] / Q15_MAX).tolist()
+        ys = (self._y[w] / Q15_MAX).tolist()
+        return list(zip(xs, ys, self._t[w].tolist()))
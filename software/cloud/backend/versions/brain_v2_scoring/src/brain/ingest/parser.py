@@ -1,7 +1,9 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Union
 import struct
 
+import numpy as np
+
 WB_MAGIC = 0x5742  # 'WB'
 WB_VERSION = 1
 WB_LEN = 24
@@ -12,6 +14,21 @@ STROKE_END = 0x04
 
 WB_STRUCT = struct.Struct("<HBBHHIIhhI")  # 24 bytes
 
+# Same layout as WB_STRUCT, for decoding many packets in one pass.
+WB_DTYPE = np.dtype([
+    ("magic", "<u2"),
+    ("version", "u1"),
+    ("flags", "u1"),
+    ("device", "<u2"),
+    ("wand", "<u2"),
+    ("packet_number", "<u4"),
+    ("stroke", "<u4"),
+    ("x_q", "<i2"),
+    ("y_q", "<i2"),
+    ("t_ms", "<u4"),
+])
+assert WB_DTYPE.itemsize == WB_STRUCT.size == WB_LEN
+
 @dataclass
 class PointEvent:
     device_number: int
@@ -79,3 +96,86 @@ def parse_packet(raw: bytes) -> Optional[PointEvent]:
         pass
 
     return None
+
+
+@dataclass
+class PointBatch:
+    """Struct-of-arrays view of a run of valid wb-point-v1 packets, in arrival order."""
+    device: np.ndarray
+    wand: np.ndarray
+    stroke: np.ndarray
+    packet_number: np.ndarray
+    x_q: np.ndarray
+    y_q: np.ndarray
+    t_ms: np.ndarray
+    flags: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.t_ms.shape[0])
+
+    def events(self) -> Iterator[PointEvent]:
+        columns = (
+            self.device.tolist(),
+            self.wand.tolist(),
+            self.stroke.tolist(),
+            self.packet_number.tolist(),
+            self.x_q.tolist(),
+            self.y_q.tolist(),
+            self.t_ms.tolist(),
+            self.flags.tolist(),
+        )
+        for device, wand, stroke_id, pkt_no, x_q, y_q, t_ms, flags in zip(*columns):
+            yield PointEvent(
+                device_number=device,
+                wand_id=wand,
+                stroke_id=stroke_id,
+                packet_number=pkt_no,
+                x=x_q / 32767.0,
+                y=y_q / 32767.0,
+                timestamp_ms=t_ms,
+                flags=flags,
+                pen_down=bool(flags & PEN_DOWN),
+                stroke_start=bool(flags & STROKE_START),
+                stroke_end=bool(flags & STROKE_END),
+            )
+
+
+def parse_packets_batch(
+    packets: Union[bytes, bytearray, memoryview, Iterable[bytes]],
+) -> PointBatch:
+    """
+    Decodes many wb-point-v1 packets at once.
+
+    Accepts either one contiguous buffer of back-to-back 24-byte records or an
+    iterable of datagrams. Datagrams that are not exactly 24 bytes are skipped
+    (the legacy CSV fallback is only handled by parse_packet), and records with
+    a bad magic, version or Q15 coordinate are dropped, matching parse_packet.
+    """
+    if isinstance(packets, (bytes, bytearray, memoryview)):
+        buf = packets
+        usable = len(buf) - (len(buf) % WB_LEN)
+        if usable != len(buf):
+            buf = memoryview(buf)[:usable]
+    else:
+        buf = b"".join(p for p in packets if len(p) == WB_LEN)
+
+    recs = np.frombuffer(buf, dtype=WB_DTYPE)
+    valid = (
+        (recs["magic"] == WB_MAGIC)
+        & (recs["version"] == WB_VERSION)
+        & (recs["x_q"] >= 0)
+        & (recs["y_q"] >= 0)
+    )
+    if not valid.all():
+        recs = recs[valid]
+
+    return PointBatch(
+        device=np.ascontiguousarray(recs["device"]),
+        wand=np.ascontiguousarray(recs["wand"]),
+        stroke=np.ascontiguousarray(recs["stroke"]),
+        packet_number=np.ascontiguousarray(recs["packet_number"]),
+        x_q=np.ascontiguousarray(recs["x_q"]),
+        y_q=np.ascontiguousarray(recs["y_q"]),
+        t_ms=np.ascontiguousarray(recs["t_ms"]),
+        flags=np.ascontiguousarray(recs["flags"]),
+    )
@@ -1,22 +1,48 @@
+import select
 import socket
 import threading
 from dataclasses import dataclass
 from typing import Optional, Callable
 
+Datagram = tuple[memoryview, tuple[str, int]]
+
 @dataclass
 class LatestPacket:
     raw: bytes = b""
     addr: tuple[str, int] | None = None
 
+@dataclass
+class ReceiverStats:
+    batches: int = 0
+    datagrams: int = 0
+    bytes: int = 0
+
 class UdpReceiver:
+    """
+    Receives datagrams on a background thread.
+
+    With `on_packet` every datagram is handed over as it arrives. With `on_batch`
+    each wakeup drains every pending datagram (up to `batch_size`) into a
+    preallocated buffer ring and hands the whole batch over at once. The
+    memoryviews in a batch point into that ring, so consumers must copy anything
+    they keep past the callback.
+    """
+
     def __init__(self, host: str, port: int, bufsize: int = 2048,
-                 on_packet: Optional[Callable[[bytes, tuple[str,int]], None]] = None):
+                 on_packet: Optional[Callable[[bytes, tuple[str,int]], None]] = None,
+                 on_batch: Optional[Callable[[list[Datagram]], None]] = None,
+                 batch_size: int = 256,
+                 rcvbuf: Optional[int] = None):
         self.host = host
         self.port = port
         self.bufsize = bufsize
         self.on_packet = on_packet
+        self.on_batch = on_batch
+        self.batch_size = max(1, batch_size)
+        self.rcvbuf = rcvbuf
 
         self.latest = LatestPacket()
+        self.stats = ReceiverStats()
         self._stop = threading.Event()
         self._thread: Optional[threading.Thread] = None
 
@@ -29,18 +55,71 @@ class UdpReceiver:
     def stop(self):
         self._stop.set()
 
-    def _run(self):
+    def _open_socket(self) -> socket.socket:
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
         sock.bind((self.host, self.port))
+        return sock
+
+    def _run(self):
+        sock = self._open_socket()
+        try:
+            if self.on_batch is not None:
+                self._run_batched(sock)
+            else:
+                self._run_single(sock)
+        finally:
+            sock.close()
+
+    def _run_single(self, sock: socket.socket):
         sock.settimeout(0.5)
 
         while not self._stop.is_set():
             try:
                 data, addr = sock.recvfrom(self.bufsize)
                 self.latest = LatestPacket(raw=data, addr=addr)
+                self.stats.batches += 1
+                self.stats.datagrams += 1
+                self.stats.bytes += len(data)
                 if self.on_packet:
                     self.on_packet(data, addr)
             except TimeoutError:
                 continue
             except OSError:
                 break
+
+    def _run_batched(self, sock: socket.socket):
+        sock.setblocking(False)
+        ring = memoryview(bytearray(self.batch_size * self.bufsize))
+        slots = [ring[i * self.bufsize:(i + 1) * self.bufsize] for i in range(self.batch_size)]
+
+        while not self._stop.is_set():
+            try:
+                readable, _, _ = select.select([sock], [], [], 0.5)
+            except OSError:
+                break
+            if not readable:
+                continue
+
+            batch: list[Datagram] = []
+            nbytes_total = 0
+            for slot in slots:
+                try:
+                    nbytes, addr = sock.recvfrom_into(slot)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    return
+                batch.append((slot[:nbytes], addr))
+                nbytes_total += nbytes
+
+            if not batch:
+                continue
+
+            last_view, last_addr = batch[-1]
+            self.latest = LatestPacket(raw=bytes(last_view), addr=last_addr)
+            self.stats.batches += 1
+            self.stats.datagrams += len(batch)
+            self.stats.bytes += nbytes_total
+            self.on_batch(batch)
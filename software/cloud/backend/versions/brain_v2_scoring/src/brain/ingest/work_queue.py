@@ -0,0 +1,114 @@
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class QueueStats:
+    enqueued: int = 0
+    processed: int = 0
+    dropped: int = 0
+    max_depth: int = 0
+
+class BoundedWorkQueue:
+    """
+    Bounded hand-off between the UDP thread and a dedicated worker thread.
+
+    Producers never block: when the queue is full the item is dropped according
+    to `policy` (evict the oldest queued item, or refuse the new one) and the
+    drop is counted. The worker pops one item at a time and calls `handler`
+    outside the queue lock, so at most `maxsize` items wait behind the one
+    being handled.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], maxsize: int = 8192,
+                 policy: str = DROP_OLDEST):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"unknown drop policy {policy!r}, expected one of {DROP_POLICIES}")
+        self.handler = handler
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+
+        self.stats = QueueStats()
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stops the worker after it has handled everything already queued."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def put(self, item: Any) -> bool:
+        return self.put_many((item,)) == 1
+
+    def put_many(self, items: Iterable[Any]) -> int:
+        accepted = 0
+        with self._cond:
+            for item in items:
+                if len(self._items) >= self.maxsize:
+                    self.stats.dropped += 1
+                    if self.policy == DROP_NEWEST:
+                        continue
+                    self._items.popleft()
+                self._items.append(item)
+                accepted += 1
+            self.stats.enqueued += accepted
+            self.stats.max_depth = max(self.stats.max_depth, len(self._items))
+            if accepted:
+                self._cond.notify()
+        return accepted
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "maxsize": self.maxsize,
+                "depth": len(self._items),
+                "max_depth": self.stats.max_depth,
+                "enqueued": self.stats.enqueued,
+                "processed": self.stats.processed,
+                "dropped": self.stats.dropped,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items and not self._stop:
+                    self._cond.wait()
+                if not self._items:
+                    return
+                # One at a time: whatever the worker hasn't started on stays in
+                # `_items`, so maxsize, the drop policy and depth() all see it.
+                item = self._items.popleft()
+
+            try:
+                self.handler(item)
+            except Exception:
+                logger.exception("work queue handler failed")
+
+            with self._cond:
+                self.stats.processed += 1
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    data: bytes
+    etag: str  # strong validator, quoted as sent on the wire
+
+
+def encode_png(img: Image.Image) -> EncodedImage:
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    data = out.getvalue()
+    return EncodedImage(data=data, etag=f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"')
+
+
+class EncodedImageCache:
+    """Thread-safe LRU of encoded images, bounded by the total size of the stored bytes."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max(0, max_bytes)
+        self._items: "OrderedDict[Hashable, EncodedImage]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, key: Hashable, image: EncodedImage):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.data)
+            if len(image.data) > self.max_bytes:
+                return
+            self._items[key] = image
+            self._bytes += len(image.data)
+            while self._bytes > self.max_bytes:
+                _key, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted.data)
+                self.evictions += 1
+
+    def get(self, key: Hashable) -> Optional[EncodedImage]:
+        with self._lock:
+            image = self._items.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import numpy as np
 from PIL import Image, ImageDraw
 
 Point = Tuple[float, float, int]  # (x, y, t)
@@ -45,6 +46,70 @@ def _fixed_xy(points: List[Point], size: int, margin: int = 10):
     return out
 
 
+def _normalize_xy_arrays(xs: np.ndarray, ys: np.ndarray, size: int, margin: int = 10) -> np.ndarray:
+    minx, maxx = float(xs.min()), float(xs.max())
+    miny, maxy = float(ys.min()), float(ys.max())
+
+    w = maxx - minx
+    h = maxy - miny
+    if w == 0 and h == 0:
+        return np.full((xs.shape[0], 2), size // 2, dtype=np.int64)
+
+    span = max(w, h)
+    scale = (size - 2 * margin) / span if span > 0 else 1.0
+
+    cx = (minx + maxx) / 2.0
+    cy = (miny + maxy) / 2.0
+    nx = np.rint((xs - cx) * scale + size / 2.0)
+    ny = np.rint((ys - cy) * scale + size / 2.0)
+    return np.stack((nx, ny), axis=1).astype(np.int64)
+
+
+def _fixed_xy_arrays(xs: np.ndarray, ys: np.ndarray, size: int, margin: int = 10) -> np.ndarray:
+    span = max(1, size - 2 * margin)
+    nx = margin + np.rint(np.clip(xs, 0.0, 1.0) * span)
+    ny = margin + np.rint(np.clip(ys, 0.0, 1.0) * span)
+    return np.stack((nx, ny), axis=1).astype(np.int64)
+
+
+def _draw_xy(img: Image.Image, xy: list, stroke: int) -> Image.Image:
+    draw = ImageDraw.Draw(img)
+
+    if len(xy) == 1:
+        x, y = xy[0]
+        r = max(1, stroke)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=255)
+        return img
+
+    # draw polyline
+    draw.line(xy, fill=255, width=stroke, joint="curve")
+    return img
+
+
+def rasterize_q15(
+    x_q: np.ndarray,
+    y_q: np.ndarray,
+    size: int = 256,
+    stroke: int = 3,
+    normalize_view: bool = True,
+) -> Image.Image:
+    """
+    Same as rasterize(), but takes Q15 coordinate columns (e.g. PointRing views)
+    and maps them to pixels vectorized, without building per-point tuples.
+    """
+    img = Image.new("L", (size, size), 0)
+    if len(x_q) == 0:
+        return img
+
+    xs = x_q / 32767.0
+    ys = y_q / 32767.0
+    if normalize_view:
+        xy = _normalize_xy_arrays(xs, ys, size=size, margin=10)
+    else:
+        xy = _fixed_xy_arrays(xs, ys, size=size, margin=10)
+    return _draw_xy(img, [tuple(p) for p in xy.tolist()], stroke)
+
+
 def rasterize(
     points: List[Point],
     size: int = 256,
@@ -62,14 +127,76 @@ def rasterize(
         xy = _normalize_xy(points, size=size, margin=10)
     else:
         xy = _fixed_xy(points, size=size, margin=10)
-    draw = ImageDraw.Draw(img)
+    return _draw_xy(img, xy, stroke)
 
-    if len(xy) == 1:
-        x, y = xy[0]
-        r = max(1, stroke)
-        draw.ellipse((x - r, y - r, x + r, y + r), fill=255)
-        return img
 
-    # draw polyline
-    draw.line(xy, fill=255, width=stroke, joint="curve")
-    return img
+class IncrementalCanvas:
+    """
+    Persistent fixed-viewport canvas for one attempt (normalize_view=False).
+
+    update() only draws the points appended since the previous call, so the
+    total drawing work over an attempt is linear in its length. The previous
+    two pixels are redrawn with each chunk so joints across chunk boundaries
+    come out exactly as in one rasterize_q15() call.
+
+    After each update, `dirty` is the (x0, y0, x1, y1) box, end-exclusive,
+    that holds every pixel the update may have set (None if nothing was
+    drawn), and `cleared` tells whether the canvas was wiped first.
+    """
+
+    def __init__(self, size: int = 256, stroke: int = 3):
+        self.size = size
+        self.stroke = stroke
+        self.img = Image.new("L", (size, size), 0)
+        self.drawn = 0  # PointRing.total at the last update
+        self._tail: list = []
+        self._dot = False
+        self.dirty: Optional[Tuple[int, int, int, int]] = None
+        self.cleared = False
+
+    def update(self, x_q: np.ndarray, y_q: np.ndarray, total: int) -> Image.Image:
+        """
+        Draws the newest `total - drawn` points of the given columns. If more
+        points arrived than the columns still hold (a PointRing wrapped between
+        updates), they don't continue the previous tail, so the canvas is
+        redrawn from the columns instead.
+        """
+        new = total - self.drawn
+        self.dirty = None
+        self.cleared = False
+        if new <= 0:
+            return self.img
+        if new > len(x_q):
+            return self.redraw(x_q, y_q, total)
+
+        xy = _fixed_xy_arrays(x_q[-new:] / 32767.0, y_q[-new:] / 32767.0, size=self.size, margin=10)
+        pts = self._tail + [tuple(p) for p in xy.tolist()]
+        if self._dot and len(pts) > 1:
+            # A lone first point is drawn as a dot, which a polyline never has.
+            self.img.paste(0, (0, 0, self.size, self.size))
+            self._dot = False
+            self.cleared = True
+        _draw_xy(self.img, pts, self.stroke)
+        pad = self.stroke + 1  # covers the line width, curve joints and the dot radius
+        xs = [p[0] for p in pts]
+        ys = [p[1] for p in pts]
+        self.dirty = (
+            max(0, min(xs) - pad),
+            max(0, min(ys) - pad),
+            min(self.size, max(xs) + pad + 1),
+            min(self.size, max(ys) + pad + 1),
+        )
+        self._dot = len(pts) == 1
+        self._tail = pts[-2:]
+        self.drawn = total
+        return self.img
+
+    def redraw(self, x_q: np.ndarray, y_q: np.ndarray, total: int) -> Image.Image:
+        """Clears the canvas and draws exactly the given columns."""
+        self.img.paste(0, (0, 0, self.size, self.size))
+        self._tail = []
+        self._dot = False
+        self.drawn = total - len(x_q)
+        self.update(x_q, y_q, total)
+        self.cleared = True
+        return self.img
@@ -2,6 +2,12 @@ from .similarity import (
     ScoreResult,
     TemplateRef,
     compute_score,
+    compute_score_raster,
+    image_to_bin,
     list_templates,
 )
+from .bank import SCORE_METHODS, BankTemplate, TemplateBank
+from .pointcloud import cloud_from_mask, cloud_from_points
+from .live import LiveScore
 
+from .cache import ScoreCache
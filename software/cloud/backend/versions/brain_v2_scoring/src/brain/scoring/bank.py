@@ -0,0 +1,458 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from .compiled import bank_id, read_compiled, write_compiled
+from .chamfer import chamfer_distances, pack_distance_transform, score_from_chamfer
+from .pointcloud import DEFAULT_CLOUD_POINTS, cloud_distances, cloud_from_mask, score_from_distance
+from .similarity import (
+    ScoreResult,
+    TemplateRef,
+    _score_from_counts,
+    _to_bin,
+    coarse_signature,
+    image_to_bin,
+    popcount_rows,
+    score_packed,
+)
+
+# "raster" compares bitmaps (IoU/Dice), "chamfer" measures distance to the
+# template's strokes, "pointcloud" matches resampled stroke points ($P-style).
+SCORE_METHODS = ("raster", "chamfer", "pointcloud")
+
+# top_k only pre-screens banks of more than PRUNE_FACTOR * top_k templates:
+# the coarse signature of the drawing costs more than fully scoring a small
+# bank (tools/bench_scoring.py).
+PRUNE_FACTOR = 4
+
+
+@dataclass(frozen=True)
+class BankTemplate:
+    ref: TemplateRef
+    packed: np.ndarray  # np.packbits of the size x size binarized template
+    pixels_on: int
+    stat: tuple[int, int]  # (mtime_ns, size) of the PNG it was loaded from
+    # low-resolution pre-screen signature, see coarse_signature()
+    coarse: np.ndarray
+    coarse_on: int
+    moments: np.ndarray
+    # normalized point cloud for the point-cloud matcher, see cloud_from_mask()
+    cloud: np.ndarray
+    # flattened distance transform for chamfer scoring, see pack_distance_transform()
+    dt: np.ndarray
+
+    @property
+    def template_id(self) -> str:
+        return self.ref.template_id
+
+
+class TemplateBank:
+    """
+    In-memory set of binarized templates for one directory.
+
+    Every template PNG is decoded, resized and thresholded once. The directory
+    is re-scanned at most every `recheck_ms`; only added or modified files are
+    reloaded, and `version` increases whenever the set of templates changes.
+
+    With `top_k`, rank() first orders templates by a cheap coarse signature
+    (grid x grid occupancy plus moments) and only fully scores the best k,
+    once the bank holds more than `prune_factor` * k templates. Smaller
+    banks are scored in full and cut to the best k.
+    rank_clouds() is the point-cloud ($P-style) alternative to rank(), and
+    rank_chamfer() scores against each template's precomputed distance transform.
+
+    With `compiled_path`, templates whose PNG is unchanged since compile() are
+    taken from that file (memory-mapped, so processes share the pages) instead
+    of being decoded again; other PNGs are loaded as usual.
+    """
+
+    def __init__(
+        self,
+        template_dir: Path,
+        size: int = 256,
+        threshold: int = 10,
+        recheck_ms: int = 1000,
+        grid: int = 32,
+        cloud_points: int = DEFAULT_CLOUD_POINTS,
+        compiled_path: Optional[Path] = None,
+        prune_factor: int = PRUNE_FACTOR,
+    ):
+        self.template_dir = Path(template_dir)
+        self.compiled_path = None if compiled_path is None else Path(compiled_path)
+        self.size = size
+        self.threshold = threshold
+        self.grid = grid
+        self.prune_factor = max(1, prune_factor)
+        self.cloud_points = cloud_points
+        self.recheck_s = max(0, recheck_ms) / 1000.0
+        self.version = 0
+        # Content id of the last complete scan (template ids and PNG stats).
+        # Unlike `version` it is the same in every process that sees the same
+        # directory, e.g. a ScoringPool's workers. None until a complete scan.
+        self.fingerprint: Optional[str] = None
+        self._templates: tuple[BankTemplate, ...] = ()
+        # all packed bitmaps stacked row-wise, in _templates order
+        self._matrix = np.zeros((0, (size * size + 7) // 8), dtype=np.uint8)
+        self._pixels_on = np.zeros(0, dtype=np.int64)
+        self._coarse = np.zeros((0, (grid * grid + 7) // 8), dtype=np.uint8)
+        self._coarse_on = np.zeros(0, dtype=np.int64)
+        self._moments = np.zeros((0, 4))
+        self._clouds = np.zeros((0, cloud_points, 2))
+        # pixel-major (size * size, T) so chamfer gathers are contiguous
+        self._dts = np.zeros((size * size, 0), dtype=np.uint8)
+        self._by_id: dict[str, BankTemplate] = {}
+        self._signature: Optional[tuple] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        # (stat of compiled_path, header, arrays, templates by id) as last read
+        self._compiled: Optional[tuple] = None
+
+    def _params(self) -> dict:
+        return {
+            "size": self.size,
+            "threshold": self.threshold,
+            "grid": self.grid,
+            "cloud_points": self.cloud_points,
+        }
+
+    def _load_compiled(self) -> Optional[tuple]:
+        """The compiled file's contents, re-read only if it changed; None if absent or unusable."""
+        if self.compiled_path is None:
+            return None
+        try:
+            st = os.stat(self.compiled_path)
+        except FileNotFoundError:
+            self._compiled = None
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        if self._compiled is not None and self._compiled[0] == key:
+            return self._compiled
+        try:
+            header, arrays = read_compiled(self.compiled_path)
+        except (OSError, ValueError, KeyError):
+            self._compiled = None
+            return None
+        if any(header.get(k) != v for k, v in self._params().items()):
+            self._compiled = None  # built with other settings
+            return None
+        by_id = {}
+        for i, meta in enumerate(header["templates"]):
+            tid = meta["template_id"]
+            by_id[tid] = BankTemplate(
+                ref=TemplateRef(
+                    template_id=tid,
+                    name=meta["name"],
+                    path=str(self.template_dir / f"{tid}.png"),
+                ),
+                packed=arrays["matrix"][i],
+                pixels_on=int(arrays["pixels_on"][i]),
+                stat=tuple(meta["stat"]),
+                coarse=arrays["coarse"][i],
+                coarse_on=int(arrays["coarse_on"][i]),
+                moments=arrays["moments"][i],
+                cloud=arrays["clouds"][i],
+                dt=arrays["dts"][:, i],
+            )
+        self._compiled = (key, header, arrays, by_id)
+        return self._compiled
+
+    def _scan(self) -> dict[str, tuple[Path, tuple[int, int]]]:
+        found = {}
+        try:
+            entries = list(os.scandir(self.template_dir))
+        except FileNotFoundError:
+            return found
+        for entry in entries:
+            if entry.name.endswith(".png") and entry.is_file():
+                st = entry.stat()
+                found[Path(entry.name).stem] = (Path(entry.path), (st.st_mtime_ns, st.st_size))
+        return found
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reloads changed templates; returns True if the bank changed."""
+        now = time.monotonic()
+        if not force and (now - self._checked_at) < self.recheck_s:
+            return False
+        with self._lock:
+            if not force and (now - self._checked_at) < self.recheck_s:
+                return False
+            found = self._scan()
+            signature = tuple(sorted((tid, st) for tid, (_path, st) in found.items()))
+            self._checked_at = now
+            if signature == self._signature:
+                return False
+
+            compiled = self._load_compiled()
+            from_file = {} if compiled is None else compiled[3]
+            templates = []
+            complete = True
+            for tid in sorted(found):
+                path, st = found[tid]
+                current = self._by_id.get(tid)
+                stale = current is None or current.stat != st
+                if stale and tid in from_file and from_file[tid].stat == st:
+                    current = from_file[tid]
+                if current is None or current.stat != st:
+                    try:
+                        mask = _to_bin(path, size=self.size, threshold=self.threshold)
+                    except (OSError, ValueError):
+                        complete = False  # unreadable or half-written; retried on the next scan
+                        continue
+                    coarse, coarse_on, moments = coarse_signature(mask, grid=self.grid)
+                    current = BankTemplate(
+                        ref=TemplateRef(
+                            template_id=tid,
+                            name=tid.replace("_", " ").title(),
+                            path=str(path),
+                        ),
+                        packed=np.packbits(mask),
+                        pixels_on=int(np.count_nonzero(mask)),
+                        stat=st,
+                        coarse=coarse,
+                        coarse_on=coarse_on,
+                        moments=moments,
+                        cloud=cloud_from_mask(mask, n=self.cloud_points),
+                        dt=pack_distance_transform(mask),
+                    )
+                templates.append(current)
+
+            self._templates = tuple(templates)
+            if compiled is not None and all(from_file.get(t.template_id) is t for t in templates) \
+                    and len(templates) == len(from_file):
+                # Exactly the compiled set: use the mapped arrays as they are.
+                arrays = compiled[2]
+                self._matrix = arrays["matrix"]
+                self._pixels_on = arrays["pixels_on"]
+                self._coarse = arrays["coarse"]
+                self._coarse_on = arrays["coarse_on"]
+                self._moments = arrays["moments"]
+                self._clouds = arrays["clouds"]
+                self._dts = arrays["dts"]
+            elif templates:
+                self._matrix = np.stack([t.packed for t in templates])
+                self._pixels_on = np.array([t.pixels_on for t in templates], dtype=np.int64)
+                self._coarse = np.stack([t.coarse for t in templates])
+                self._coarse_on = np.array([t.coarse_on for t in templates], dtype=np.int64)
+                self._moments = np.stack([t.moments for t in templates])
+                self._clouds = np.stack([t.cloud for t in templates])
+                self._dts = np.stack([t.dt for t in templates], axis=1)
+            else:
+                self._matrix = self._matrix[:0]
+                self._pixels_on = self._pixels_on[:0]
+                self._coarse = self._coarse[:0]
+                self._coarse_on = self._coarse_on[:0]
+                self._moments = self._moments[:0]
+                self._clouds = self._clouds[:0]
+                self._dts = self._dts[:, :0]
+            self._by_id = {t.template_id: t for t in templates}
+            self._signature = signature if complete else None
+            self.fingerprint = None
+            if complete:
+                self.fingerprint = bank_id(
+                    [{"template_id": tid, "stat": list(st)} for tid, st in signature]
+                )
+            self.version += 1
+            return True
+
+    def compile(self, path: Optional[Path] = None) -> dict:
+        """
+        Writes the current templates to a compiled bank file (compiled_path by
+        default), atomically, and returns its header.
+        """
+        path = Path(path) if path is not None else self.compiled_path
+        if path is None:
+            raise ValueError("no compiled bank path configured")
+        self.refresh(force=True)
+        with self._lock:
+            templates = self._templates
+            arrays = {
+                "matrix": self._matrix,
+                "pixels_on": self._pixels_on,
+                "coarse": self._coarse,
+                "coarse_on": self._coarse_on,
+                "moments": self._moments,
+                "clouds": self._clouds,
+                "dts": self._dts,
+            }
+            metas = [
+                {"template_id": t.template_id, "name": t.ref.name, "stat": list(t.stat)}
+                for t in templates
+            ]
+            return write_compiled(path, self._params(), metas, arrays)
+
+    def templates(self) -> tuple[BankTemplate, ...]:
+        self.refresh()
+        return self._templates
+
+    def refs(self) -> list[TemplateRef]:
+        return [t.ref for t in self.templates()]
+
+    def get(self, template_id: str) -> Optional[BankTemplate]:
+        self.refresh()
+        return self._by_id.get(template_id)
+
+    def score_image(self, drawing: Image.Image, template: BankTemplate) -> ScoreResult:
+        return self.score(image_to_bin(drawing, size=self.size, threshold=self.threshold), template)
+
+    def score(self, draw_mask: np.ndarray, template: BankTemplate) -> ScoreResult:
+        draw_packed = np.packbits(draw_mask)
+        return score_packed(
+            draw_packed, int(np.count_nonzero(draw_mask)),
+            template.template_id, template.packed, template.pixels_on,
+        )
+
+    def score_all(self, draw_mask: np.ndarray) -> list[ScoreResult]:
+        """Scores the drawing against every template in one pass, in bank order."""
+        return self.rank_with_pruning(draw_mask, top_k=None, ranked=False)[0]
+
+    def rank(self, draw_mask: np.ndarray, top_k: Optional[int] = None) -> list[ScoreResult]:
+        """Scored templates, best first; ties keep bank (template_id) order."""
+        return self.rank_with_pruning(draw_mask, top_k=top_k)[0]
+
+    def rank_with_pruning(
+        self,
+        draw_mask: np.ndarray,
+        top_k: Optional[int] = None,
+        ranked: bool = True,
+    ) -> tuple[list[ScoreResult], int]:
+        """
+        Like rank(), also returning how many templates the coarse pre-screen
+        pruned. Returns the best top_k, or everything for None or 0; see
+        prunes() for when the pre-screen runs.
+        """
+        self.refresh()
+        with self._lock:
+            templates, matrix, pixels_on = self._templates, self._matrix, self._pixels_on
+            coarse, coarse_on, moments = self._coarse, self._coarse_on, self._moments
+        if not templates:
+            return [], 0
+
+        bank_size = len(templates)
+        if self.prunes(bank_size, top_k):
+            keep = self._shortlist(draw_mask, top_k, coarse, coarse_on, moments)
+            templates = [templates[i] for i in keep.tolist()]
+            matrix = matrix[keep]
+            pixels_on = pixels_on[keep]
+
+        draw_packed = np.packbits(draw_mask)
+        draw_on = int(np.count_nonzero(draw_mask))
+        inter = popcount_rows(np.bitwise_and(matrix, draw_packed)).tolist()
+        results = [
+            _score_from_counts(t.template_id, draw_on, tmpl_on, i, draw_on + tmpl_on - i)
+            for t, tmpl_on, i in zip(templates, pixels_on.tolist(), inter)
+        ]
+        if ranked:
+            results.sort(key=lambda r: r.score, reverse=True)
+        return results[:top_k or None], bank_size - len(results)
+
+    def evaluate(
+        self,
+        method: str,
+        draw_mask: Optional[np.ndarray] = None,
+        cloud: Optional[np.ndarray] = None,
+        template_id: Optional[str] = None,
+        top_k: Optional[int] = None,
+    ) -> tuple[list[ScoreResult], int]:
+        """
+        One scoring request: the single template_id if given, otherwise the
+        whole bank best first. Returns (results, templates pruned by top_k).
+        pointcloud needs `cloud`, the other methods `draw_mask`.
+        """
+        if method not in SCORE_METHODS:
+            raise ValueError(f"unknown scoring method {method!r}, expected one of {SCORE_METHODS}")
+        if template_id:
+            template = self.get(template_id)
+            if template is None:
+                raise KeyError(template_id)
+            if method == "pointcloud":
+                return [self.score_cloud(cloud, template)], 0
+            if method == "chamfer":
+                return [self.score_chamfer(draw_mask, template)], 0
+            return [self.score(draw_mask, template)], 0
+        if method == "pointcloud":
+            # Cost depends on the cloud size only, so the coarse pre-screen is not used.
+            return self.rank_clouds(cloud), 0
+        if method == "chamfer":
+            return self.rank_chamfer(draw_mask, top_k=top_k)
+        return self.rank_with_pruning(draw_mask, top_k=top_k)
+
+    def score_chamfer(self, draw_mask: np.ndarray, template: BankTemplate) -> ScoreResult:
+        distance = float(chamfer_distances(draw_mask, template.dt[:, None])[0])
+        draw_on = int(np.count_nonzero(draw_mask))
+        return score_from_chamfer(template.template_id, distance, draw_on, template.pixels_on)
+
+    def rank_chamfer(
+        self,
+        draw_mask: np.ndarray,
+        top_k: Optional[int] = None,
+    ) -> tuple[list[ScoreResult], int]:
+        """Chamfer scores, best first, and how many templates top_k pruned, as rank_with_pruning."""
+        self.refresh()
+        with self._lock:
+            templates, dts, pixels_on = self._templates, self._dts, self._pixels_on
+            coarse, coarse_on, moments = self._coarse, self._coarse_on, self._moments
+        if not templates:
+            return [], 0
+
+        bank_size = len(templates)
+        if self.prunes(bank_size, top_k):
+            keep = self._shortlist(draw_mask, top_k, coarse, coarse_on, moments)
+            templates = [templates[i] for i in keep.tolist()]
+            dts = dts[:, keep]
+            pixels_on = pixels_on[keep]
+
+        draw_on = int(np.count_nonzero(draw_mask))
+        distances = chamfer_distances(draw_mask, dts).tolist()
+        results = [
+            score_from_chamfer(t.template_id, d, draw_on, tmpl_on)
+            for t, d, tmpl_on in zip(templates, distances, pixels_on.tolist())
+        ]
+        results.sort(key=lambda r: r.score, reverse=True)
+        return results[:top_k or None], bank_size - len(results)
+
+    def score_cloud(self, cloud: np.ndarray, template: BankTemplate) -> ScoreResult:
+        distance = float(cloud_distances(cloud, template.cloud[None])[0])
+        return score_from_distance(template.template_id, distance, self.cloud_points)
+
+    def rank_clouds(self, cloud: np.ndarray) -> list[ScoreResult]:
+        """Point-cloud scores of every template for a normalized cloud, best first."""
+        self.refresh()
+        with self._lock:
+            templates, clouds = self._templates, self._clouds
+        distances = cloud_distances(cloud, clouds).tolist()
+        results = [
+            score_from_distance(t.template_id, d, self.cloud_points)
+            for t, d in zip(templates, distances)
+        ]
+        results.sort(key=lambda r: r.score, reverse=True)
+        return results
+
+    def prunes(self, bank_size: int, top_k: Optional[int]) -> bool:
+        """Whether ranking `bank_size` templates with this top_k runs the coarse pre-screen."""
+        return bool(top_k) and bank_size > self.prune_factor * top_k
+
+    def _shortlist(
+        self,
+        draw_mask: np.ndarray,
+        top_k: int,
+        coarse: np.ndarray,
+        coarse_on: np.ndarray,
+        moments: np.ndarray,
+    ) -> np.ndarray:
+        """Bank indices (ascending) of the top_k templates by coarse similarity."""
+        d_coarse, d_on, d_moments = coarse_signature(draw_mask, grid=self.grid)
+        inter = popcount_rows(np.bitwise_and(coarse, d_coarse))
+        total = coarse_on + d_on
+        dice = np.divide(2.0 * inter, total, out=np.zeros(len(total)), where=total > 0)
+        # Occupancy overlap, nudged by how far apart centroid/spread are.
+        similarity = dice - 0.5 * np.abs(moments - d_moments).mean(axis=1)
+        keep = np.argpartition(-similarity, top_k - 1)[:top_k]
+        return np.sort(keep)
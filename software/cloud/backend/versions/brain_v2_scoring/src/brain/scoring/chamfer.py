@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import numpy as np
+
+from .similarity import ScoreResult
+
+# Distance transforms are stored as uint8 in quarter pixels, so distances
+# saturate at 255 / DT_SCALE = 63.75 px; far beyond CHAMFER_RADIUS_PX anyway.
+DT_SCALE = 4
+# Mean drawing-to-template distance (px, at 256 x 256) that scores 0.
+CHAMFER_RADIUS_PX = 12.0
+
+
+def distance_transform(mask: np.ndarray) -> np.ndarray:
+    """Exact Euclidean distance from every pixel to the nearest on pixel of mask."""
+    h, w = mask.shape
+    if not mask.any():
+        return np.full((h, w), np.inf)
+
+    # Column pass: distance to the nearest on pixel in the same column.
+    col = np.empty((h, w))
+    col[0] = np.where(mask[0], 0.0, h + w)
+    for y in range(1, h):
+        col[y] = np.where(mask[y], 0.0, col[y - 1] + 1.0)
+    for y in range(h - 2, -1, -1):
+        col[y] = np.minimum(col[y], col[y + 1] + 1.0)
+
+    # Row pass: d2[y, x] = min over x' of col[y, x']^2 + (x - x')^2.
+    col2 = col ** 2
+    dx2 = (np.arange(w)[:, None] - np.arange(w)[None, :]) ** 2.0
+    out = np.empty((h, w))
+    chunk = 16
+    for y in range(0, h, chunk):
+        out[y:y + chunk] = (col2[y:y + chunk, None, :] + dx2[None, :, :]).min(axis=2)
+    return np.sqrt(out)
+
+
+def pack_distance_transform(mask: np.ndarray) -> np.ndarray:
+    """Flattened distance transform in the bank's compact uint8 form."""
+    dt = distance_transform(mask)
+    return np.minimum(np.rint(dt * DT_SCALE), 255).astype(np.uint8).ravel()
+
+
+def chamfer_distances(draw_mask: np.ndarray, dts: np.ndarray) -> np.ndarray:
+    """
+    Mean distance (px) from the drawing's on pixels to each template.
+
+    dts is pixel-major, (h * w, T), so the gather reads one contiguous row of
+    T values per drawing pixel.
+    """
+    on = np.flatnonzero(draw_mask)
+    if on.size == 0:
+        return np.full(dts.shape[1], np.inf)
+    return np.take(dts, on, axis=0).sum(axis=0, dtype=np.uint32) / (on.size * DT_SCALE)
+
+
+def score_from_chamfer(
+    template_id: str,
+    distance: float,
+    draw_on: int,
+    tmpl_on: int,
+) -> ScoreResult:
+    closeness = max(0.0, 1.0 - distance / CHAMFER_RADIUS_PX)
+    # The distance is one-sided (drawing to template), so a fragment lying on
+    # the template would be perfect; the area ratio keeps that in check.
+    area_ratio = (min(draw_on, tmpl_on) / max(draw_on, tmpl_on)) if max(draw_on, tmpl_on) else 0.0
+
+    score = 100.0 * (0.8 * closeness + 0.2 * area_ratio)
+
+    return ScoreResult(
+        template_id=template_id,
+        template_name=template_id.replace("_", " ").title(),
+        score=round(score, 3),
+        metrics={
+            "chamfer_px": round(float(distance), 4) if np.isfinite(distance) else None,
+            "area_ratio": round(area_ratio, 4),
+            "draw_pixels_on": draw_on,
+            "template_pixels_on": tmpl_on,
+        },
+    )
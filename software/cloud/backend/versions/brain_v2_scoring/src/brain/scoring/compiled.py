@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Compiled template bank file:
+#   MAGIC | u64 header length | JSON header | padding | arrays
+# Every array starts on an ALIGN boundary so it can be np.memmap'ed in place;
+# header["arrays"] holds dtype, shape and offset (from the end of the padded
+# header) of each one.
+MAGIC = b"WBTBANK\x00"
+FORMAT_VERSION = 1
+ALIGN = 64
+_LEN = struct.Struct("<Q")
+
+# Arrays a compiled bank must contain, in file order.
+ARRAY_NAMES = ("matrix", "pixels_on", "coarse", "coarse_on", "moments", "clouds", "dts")
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def bank_id(templates: list[dict]) -> str:
+    """Content id of a compiled bank: template ids and the stats of their PNGs."""
+    key = json.dumps([[t["template_id"], t["stat"]] for t in templates]).encode()
+    return hashlib.blake2b(key, digest_size=8).hexdigest()
+
+
+def write_compiled(
+    path: Path,
+    params: dict,
+    templates: list[dict],
+    arrays: dict[str, np.ndarray],
+) -> dict:
+    """
+    Writes a compiled bank atomically (temp file + rename in the same
+    directory) and returns its header. `params` are the bank settings the
+    arrays were built with; `templates` is one dict per row with
+    template_id, name and stat.
+    """
+    path = Path(path)
+    layout = {}
+    offset = 0
+    for name in ARRAY_NAMES:
+        arr = np.ascontiguousarray(arrays[name])
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _aligned(offset + arr.nbytes)
+
+    header = {
+        "format": FORMAT_VERSION,
+        **params,
+        "bank_id": bank_id(templates),
+        "created_ms": int(time.time() * 1000),
+        "templates": templates,
+        "arrays": layout,
+    }
+    raw = json.dumps(header).encode()
+    data_start = _aligned(len(MAGIC) + _LEN.size + len(raw))
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + _LEN.pack(len(raw)) + raw)
+            for name in ARRAY_NAMES:
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(arrays[name]).tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return header
+
+
+def read_compiled(path: Path) -> tuple[dict, dict[str, np.ndarray]]:
+    """Header and read-only memory-mapped arrays of a compiled bank; ValueError if malformed."""
+    path = Path(path)
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + _LEN.size)
+        if len(prefix) != len(MAGIC) + _LEN.size or prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled template bank")
+        (header_len,) = _LEN.unpack(prefix[len(MAGIC):])
+        try:
+            header = json.loads(f.read(header_len))
+        except ValueError as exc:
+            raise ValueError(f"{path}: corrupt header") from exc
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format {header.get('format')!r}")
+
+    data_start = _aligned(len(MAGIC) + _LEN.size + header_len)
+    arrays = {}
+    for name in ARRAY_NAMES:
+        spec = header["arrays"][name]
+        shape = tuple(spec["shape"])
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+        else:
+            arrays[name] = np.memmap(
+                path,
+                dtype=spec["dtype"],
+                mode="r",
+                offset=data_start + spec["offset"],
+                shape=shape,
+            )
+    return header, arrays
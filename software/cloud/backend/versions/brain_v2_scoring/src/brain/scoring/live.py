@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from .bank import BankTemplate
+from .similarity import ScoreResult, _score_from_counts
+
+
+class LiveScore:
+    """
+    Running raster score of an attempt against one template while it is drawn.
+
+    Keeps the binarized drawing and its on/intersection pixel counts, and
+    update() only looks at the box an IncrementalCanvas update touched: pixels
+    that turned on there are added to the counts. Strokes never erase, so the
+    counts stay exact and result() equals scoring the full image.
+    """
+
+    def __init__(self, template: BankTemplate, size: int = 256, threshold: int = 10):
+        self.template = template
+        self.size = size
+        self.threshold = threshold
+        bits = np.unpackbits(template.packed, count=size * size)
+        self._template_mask = bits.reshape(size, size).astype(bool)
+        self._mask = np.zeros((size, size), dtype=bool)
+        self.draw_on = 0
+        self.inter = 0
+
+    def reset(self):
+        self._mask[:] = False
+        self.draw_on = 0
+        self.inter = 0
+
+    def update(
+        self,
+        img: Image.Image,
+        dirty: Optional[tuple[int, int, int, int]],
+        cleared: bool = False,
+    ):
+        """Adds the pixels newly set inside `dirty` (see IncrementalCanvas)."""
+        if cleared:
+            self.reset()
+        if dirty is None:
+            return
+        x0, y0, x1, y1 = dirty
+        region = np.asarray(img.crop(dirty)) > self.threshold
+        seen = self._mask[y0:y1, x0:x1]
+        added = region & ~seen
+        self.draw_on += int(np.count_nonzero(added))
+        self.inter += int(np.count_nonzero(added & self._template_mask[y0:y1, x0:x1]))
+        seen |= added
+
+    def result(self) -> ScoreResult:
+        tmpl_on = self.template.pixels_on
+        return _score_from_counts(
+            self.template.template_id,
+            self.draw_on,
+            tmpl_on,
+            self.inter,
+            self.draw_on + tmpl_on - self.inter,
+        )
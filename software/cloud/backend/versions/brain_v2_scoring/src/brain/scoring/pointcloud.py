@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from .similarity import ScoreResult
+
+# Points per cloud, as in the $P recognizer.
+DEFAULT_CLOUD_POINTS = 32
+# Mean matched distance (in units of the normalized shape size) that scores 0.
+MATCH_RADIUS = 0.25
+
+
+def resample(xy: np.ndarray, n: int = DEFAULT_CLOUD_POINTS) -> np.ndarray:
+    """n points spaced evenly along the path through xy (an (m, 2) array)."""
+    xy = np.asarray(xy, dtype=np.float64)
+    if len(xy) == 0:
+        return np.zeros((n, 2))
+    seg = np.hypot(*np.diff(xy, axis=0).T)
+    dist = np.concatenate(([0.0], np.cumsum(seg)))
+    if dist[-1] == 0:
+        return np.repeat(xy[:1], n, axis=0)
+    at = np.linspace(0.0, dist[-1], n)
+    return np.stack((np.interp(at, dist, xy[:, 0]), np.interp(at, dist, xy[:, 1])), axis=1)
+
+
+def normalize(cloud: np.ndarray) -> np.ndarray:
+    """Moves the centroid to the origin and scales the larger bounding-box side to 1."""
+    cloud = cloud - cloud.mean(axis=0)
+    span = float((cloud.max(axis=0) - cloud.min(axis=0)).max()) if len(cloud) else 0.0
+    return cloud / span if span > 0 else cloud
+
+
+def cloud_from_points(
+    x_q: np.ndarray,
+    y_q: np.ndarray,
+    n: int = DEFAULT_CLOUD_POINTS,
+) -> np.ndarray:
+    """Normalized n-point cloud of a stroke given as Q15 x/y columns."""
+    return normalize(resample(np.stack((x_q, y_q), axis=1).astype(np.float64), n))
+
+
+def cloud_from_mask(mask: np.ndarray, n: int = DEFAULT_CLOUD_POINTS) -> np.ndarray:
+    """
+    Normalized n-point cloud of a binarized image.
+
+    Templates have no stroke order, so points are picked by farthest-point
+    sampling over the on pixels, which spreads them evenly along the strokes.
+    """
+    ys, xs = np.nonzero(mask)
+    if xs.size == 0:
+        return np.zeros((n, 2))
+    pixels = np.stack((xs, ys), axis=1).astype(np.float64)
+    picked = np.empty(n, dtype=np.int64)
+    picked[0] = 0
+    nearest = np.full(len(pixels), np.inf)
+    for k in range(1, n):
+        nearest = np.minimum(nearest, np.hypot(*(pixels - pixels[picked[k - 1]]).T))
+        picked[k] = int(nearest.argmax())
+    return normalize(pixels[picked])
+
+
+def _greedy_distances(dist: np.ndarray, start: int) -> np.ndarray:
+    """
+    $P greedy cloud distance for each of the T (n, n) distance matrices in
+    dist, matching rows to columns starting at row `start`. Earlier matches
+    weigh more; returns the weighted mean matched distance per matrix.
+    """
+    t, n, _ = dist.shape
+    rows = np.arange(t)
+    matched = np.zeros((t, n), dtype=bool)
+    total = np.zeros(t)
+    for k in range(n):
+        d = np.where(matched, np.inf, dist[:, (start + k) % n, :])
+        j = d.argmin(axis=1)
+        total += (1.0 - k / n) * d[rows, j]
+        matched[rows, j] = True
+    return total / ((n + 1) / 2.0)
+
+
+def cloud_distances(cloud: np.ndarray, templates: np.ndarray) -> np.ndarray:
+    """Best $P distance from one (n, 2) cloud to each of the (T, n, 2) template clouds."""
+    if len(templates) == 0:
+        return np.zeros(0)
+    n = cloud.shape[0]
+    dist = np.sqrt(((cloud[None, :, None, :] - templates[:, None, :, :]) ** 2).sum(axis=-1))
+    dist_t = dist.transpose(0, 2, 1)
+    step = max(1, int(math.floor(n ** 0.5)))
+    best = np.full(len(templates), np.inf)
+    for start in range(0, n, step):
+        best = np.minimum(best, _greedy_distances(dist, start))
+        best = np.minimum(best, _greedy_distances(dist_t, start))
+    return best
+
+
+def score_from_distance(template_id: str, distance: float, n: int) -> ScoreResult:
+    similarity = max(0.0, 1.0 - distance / MATCH_RADIUS)
+    return ScoreResult(
+        template_id=template_id,
+        template_name=template_id.replace("_", " ").title(),
+        score=round(100.0 * similarity, 3),
+        metrics={
+            "mean_distance": round(float(distance), 4),
+            "cloud_points": n,
+        },
+    )
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .bank import TemplateBank
+from .similarity import ScoreResult
+
+logger = logging.getLogger(__name__)
+
+# The worker process's own bank, loaded once by _init_worker.
+_worker_bank: Optional[TemplateBank] = None
+
+
+def _init_worker(template_dir: str, bank_kwargs: dict):
+    global _worker_bank
+    _worker_bank = TemplateBank(Path(template_dir), **bank_kwargs)
+    _worker_bank.refresh(force=True)
+
+
+def _warm() -> int:
+    return _worker_bank.version
+
+
+def _evaluate_in_worker(
+    method: str,
+    mask_bits: Optional[bytes],
+    mask_shape: Optional[tuple[int, int]],
+    cloud_bytes: Optional[bytes],
+    template_id: Optional[str],
+    top_k: Optional[int],
+    bank_id: Optional[str] = None,
+) -> tuple[list[ScoreResult], int]:
+    if bank_id is not None and _worker_bank.fingerprint != bank_id:
+        # The caller's bank has seen a change (e.g. an upload) this worker's
+        # recheck timer hasn't picked up yet.
+        _worker_bank.refresh(force=True)
+    draw_mask = cloud = None
+    if mask_bits is not None:
+        h, w = mask_shape
+        bits = np.unpackbits(np.frombuffer(mask_bits, dtype=np.uint8), count=h * w)
+        draw_mask = bits.reshape(h, w).astype(bool)
+    if cloud_bytes is not None:
+        cloud = np.frombuffer(cloud_bytes, dtype=np.float64).reshape(-1, 2)
+    return _worker_bank.evaluate(
+        method,
+        draw_mask=draw_mask,
+        cloud=cloud,
+        template_id=template_id,
+        top_k=top_k,
+    )
+
+
+@dataclass
+class PoolStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    restarts: int = 0
+    in_flight: int = 0
+    max_in_flight_seen: int = 0
+
+
+class ScoringPool:
+    """
+    Runs TemplateBank.evaluate() in worker processes, off the server's GIL.
+
+    Every worker loads its own TemplateBank once and keeps it warm (reloading
+    on directory changes like the server's bank). Drawings travel as
+    np.packbits bytes (8 KiB at 256 x 256) and clouds as raw float64 bytes.
+    At most `max_in_flight` requests are outstanding; further callers block
+    until one completes, so a burst of score requests queues in the HTTP
+    threads instead of piling up work for the workers.
+
+    The workers start on start() or the first evaluate(). Once stop() has
+    been called the pool stays stopped: evaluate() raises RuntimeError.
+    """
+
+    def __init__(
+        self,
+        template_dir: Path,
+        workers: int,
+        max_in_flight: Optional[int] = None,
+        **bank_kwargs,
+    ):
+        self.template_dir = Path(template_dir).resolve()
+        self.workers = max(1, workers)
+        self.max_in_flight = max(1, max_in_flight or 2 * self.workers)
+        self.bank_kwargs = bank_kwargs
+        self.stats = PoolStats()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        # Held while workers are spawned and warmed, which takes seconds;
+        # _lock is not, so snapshot() and running requests don't wait on it.
+        self._start_lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stopped = False
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn, not fork: the server process has UDP/ingest threads running.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self.template_dir), self.bank_kwargs),
+        )
+        # Start every worker now so the first requests don't pay for bank loading.
+        for future in [executor.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _current(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("scoring pool is stopped")
+            return self._executor
+
+    def start(self) -> ProcessPoolExecutor:
+        """Starts the workers unless they are running; returns the executor."""
+        executor = self._current()
+        if executor is not None:
+            return executor
+        with self._start_lock:
+            executor = self._current()
+            if executor is not None:
+                return executor
+            executor = self._new_executor()
+            with self._lock:
+                stopped = self._stopped
+                if not stopped:
+                    self._executor = executor
+        if stopped:
+            # stop() ran while the workers were starting.
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise RuntimeError("scoring pool is stopped")
+        return executor
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def evaluate(
+        self,
+        method: str,
+        draw_mask: Optional[np.ndarray] = None,
+        cloud: Optional[np.ndarray] = None,
+        template_id: Optional[str] = None,
+        top_k: Optional[int] = None,
+        bank_id: Optional[str] = None,
+    ) -> tuple[list[ScoreResult], int]:
+        """
+        Same contract as TemplateBank.evaluate(). `bank_id` is the caller's
+        TemplateBank.fingerprint; a worker whose bank differs reloads it first.
+        """
+        args = (
+            method,
+            None if draw_mask is None else np.packbits(draw_mask).tobytes(),
+            None if draw_mask is None else draw_mask.shape,
+            None if cloud is None else np.ascontiguousarray(cloud, dtype=np.float64).tobytes(),
+            template_id,
+            top_k,
+            bank_id,
+        )
+        with self._slots:
+            with self._lock:
+                self.stats.submitted += 1
+                self.stats.in_flight += 1
+                self.stats.max_in_flight_seen = max(
+                    self.stats.max_in_flight_seen, self.stats.in_flight
+                )
+            try:
+                return self._submit(args)
+            except Exception:
+                with self._lock:
+                    self.stats.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.stats.in_flight -= 1
+
+    def _submit(self, args: tuple) -> tuple[list[ScoreResult], int]:
+        executor = self.start()
+        try:
+            result = executor.submit(_evaluate_in_worker, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool and retry once.
+            logger.warning("scoring pool broken, restarting %d workers", self.workers)
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                    self.stats.restarts += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+            result = self.start().submit(_evaluate_in_worker, *args).result()
+        with self._lock:
+            self.stats.completed += 1
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_in_flight": self.max_in_flight,
+                "running": self._executor is not None,
+                "submitted": self.stats.submitted,
+                "completed": self.stats.completed,
+                "failed": self.stats.failed,
+                "restarts": self.stats.restarts,
+                "in_flight": self.stats.in_flight,
+                "max_in_flight_seen": self.stats.max_in_flight_seen,
+            }
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Union
+import numpy as np
 from PIL import Image
 
 
@@ -30,40 +32,59 @@ def list_templates(template_dir: Path) -> list[TemplateRef]:
     return items
 
 
-def _to_bin(path: Path, size: int = 256, threshold: int = 10) -> Image.Image:
+# Set-bit count of every byte value, for popcounts over np.packbits output.
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def image_to_bin(img: Image.Image, size: int = 256, threshold: int = 10) -> np.ndarray:
     # Low threshold keeps thin strokes visible.
-    img = Image.open(path).convert("L").resize((size, size))
-    return img.point(lambda px: 255 if px > threshold else 0, mode="1")
+    img = img.convert("L")
+    if img.size != (size, size):
+        img = img.resize((size, size))
+    return np.asarray(img) > threshold
 
 
-def _count_on(img_bin: Image.Image) -> int:
-    # In mode "1", pixels are 0/255.
-    return sum(1 for v in img_bin.getdata() if v)
+def _to_bin(path: Path, size: int = 256, threshold: int = 10) -> np.ndarray:
+    return image_to_bin(Image.open(path), size=size, threshold=threshold)
 
 
-def _intersection_and_union(a: Image.Image, b: Image.Image) -> tuple[int, int]:
-    ad = a.getdata()
-    bd = b.getdata()
-    inter = 0
-    union = 0
-    for pa, pb in zip(ad, bd):
-        oa = bool(pa)
-        ob = bool(pb)
-        if oa and ob:
-            inter += 1
-        if oa or ob:
-            union += 1
-    return inter, union
+def popcount(packed: np.ndarray) -> int:
+    return int(_POPCOUNT[packed].sum())
 
 
-def compute_score(drawing_path: Path, template_path: Path) -> ScoreResult:
-    draw_bin = _to_bin(drawing_path)
-    tmpl_bin = _to_bin(template_path)
+def popcount_rows(packed: np.ndarray) -> np.ndarray:
+    """Set bits per row of a 2-D packed bitmap matrix."""
+    if hasattr(np, "bitwise_count") and packed.shape[1] % 8 == 0:
+        words = np.ascontiguousarray(packed).view(np.uint64)
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT[packed].sum(axis=1, dtype=np.int64)
 
-    draw_on = _count_on(draw_bin)
-    tmpl_on = _count_on(tmpl_bin)
-    inter, union = _intersection_and_union(draw_bin, tmpl_bin)
 
+def coarse_signature(mask: np.ndarray, grid: int = 32) -> tuple[np.ndarray, int, np.ndarray]:
+    """
+    Low-resolution pre-screen signature of a binarized image.
+
+    Returns the packed grid x grid occupancy (a cell is on if any pixel in it
+    is), its on-cell count, and (cx, cy, sx, sy): centroid and spread of the
+    on pixels as fractions of the image size.
+    """
+    h, w = mask.shape
+    occupancy = mask.reshape(grid, h // grid, grid, w // grid).any(axis=(1, 3))
+    ys, xs = np.nonzero(mask)
+    if xs.size:
+        moments = np.array([xs.mean() / w, ys.mean() / h, xs.std() / w, ys.std() / h])
+    else:
+        moments = np.zeros(4)
+    return np.packbits(occupancy), int(np.count_nonzero(occupancy)), moments
+
+
+def _score_from_counts(
+    template_id: str,
+    draw_on: int,
+    tmpl_on: int,
+    inter: int,
+    union: int,
+) -> ScoreResult:
     iou = (inter / union) if union else 0.0
     dice = (2.0 * inter / (draw_on + tmpl_on)) if (draw_on + tmpl_on) else 0.0
     area_ratio = (min(draw_on, tmpl_on) / max(draw_on, tmpl_on)) if max(draw_on, tmpl_on) else 0.0
@@ -71,7 +92,6 @@ def compute_score(drawing_path: Path, template_path: Path) -> ScoreResult:
     # Weighted composite score, 0..100.
     score = 100.0 * (0.55 * dice + 0.35 * iou + 0.10 * area_ratio)
 
-    template_id = template_path.stem
     return ScoreResult(
         template_id=template_id,
         template_name=template_id.replace("_", " ").title(),
@@ -87,3 +107,34 @@ def compute_score(drawing_path: Path, template_path: Path) -> ScoreResult:
         },
     )
 
+
+def compute_score(drawing_path: Path, template_path: Path) -> ScoreResult:
+    return compute_score_raster(_to_bin(drawing_path), template_path)
+
+
+def compute_score_raster(
+    drawing: Union[Image.Image, np.ndarray],
+    template_path: Path,
+) -> ScoreResult:
+    """compute_score() for a drawing that is already in memory (PIL image or bool mask)."""
+    draw_bin = image_to_bin(drawing) if isinstance(drawing, Image.Image) else drawing
+    tmpl_bin = _to_bin(template_path)
+
+    draw_on = int(np.count_nonzero(draw_bin))
+    tmpl_on = int(np.count_nonzero(tmpl_bin))
+    inter = int(np.count_nonzero(draw_bin & tmpl_bin))
+    union = draw_on + tmpl_on - inter
+
+    return _score_from_counts(template_path.stem, draw_on, tmpl_on, inter, union)
+
+
+def score_packed(
+    draw_packed: np.ndarray,
+    draw_on: int,
+    template_id: str,
+    tmpl_packed: np.ndarray,
+    tmpl_on: int,
+) -> ScoreResult:
+    """compute_score() on np.packbits bitmaps whose on-pixel counts are already known."""
+    inter = popcount(np.bitwise_and(draw_packed, tmpl_packed))
+    return _score_from_counts(template_id, draw_on, tmpl_on, inter, draw_on + tmpl_on - inter)
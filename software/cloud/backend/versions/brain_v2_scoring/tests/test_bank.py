@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import numpy as np
+from PIL import Image
+
+from brain.scoring import TemplateBank, compute_score, image_to_bin
+
+TEMPLATES_DIR = ROOT / "data" / "templates"
+
+
+def test_bank_scores_match_compute_score() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    drawing = TEMPLATES_DIR / "heart_v1.png"
+    mask = image_to_bin(Image.open(drawing))
+
+    results = bank.score_all(mask)
+
+    assert [r.template_id for r in results] == sorted(p.stem for p in TEMPLATES_DIR.glob("*.png"))
+    for result in results:
+        assert result == compute_score(drawing, TEMPLATES_DIR / f"{result.template_id}.png")
+
+
+def test_bank_reloads_only_when_directory_changes(tmp_path: Path) -> None:
+    shutil.copy2(TEMPLATES_DIR / "circle_v1.png", tmp_path / "circle_v1.png")
+    bank = TemplateBank(tmp_path, recheck_ms=0)
+
+    assert [t.template_id for t in bank.templates()] == ["circle_v1"]
+    first = bank.get("circle_v1")
+    version = bank.version
+    assert bank.refresh() is False
+    assert bank.version == version
+
+    shutil.copy2(TEMPLATES_DIR / "star_v1.png", tmp_path / "star_v1.png")
+    assert [t.template_id for t in bank.templates()] == ["circle_v1", "star_v1"]
+    assert bank.get("circle_v1") is first  # unchanged files are not reloaded
+    assert bank.version == version + 1
+
+    shutil.copy2(TEMPLATES_DIR / "heart_v1.png", tmp_path / "circle_v1.png")
+    st = os.stat(tmp_path / "circle_v1.png")
+    os.utime(tmp_path / "circle_v1.png", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert bank.get("circle_v1") is not first
+
+    (tmp_path / "star_v1.png").unlink()
+    assert bank.get("star_v1") is None
+
+
+def test_rank_orders_all_templates_best_first() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "star_v1.png"))
+
+    ranked = bank.rank(mask)
+
+    assert ranked[0].template_id == "star_v1"
+    assert [r.score for r in ranked] == sorted((r.score for r in ranked), reverse=True)
+    assert sorted(r.template_id for r in ranked) == [t.template_id for t in bank.templates()]
+
+
+def test_top_k_prunes_with_coarse_signature() -> None:
+    bank = TemplateBank(TEMPLATES_DIR, prune_factor=1)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "heart_v1.png"))
+
+    full, full_pruned = bank.rank_with_pruning(mask)
+    top, pruned = bank.rank_with_pruning(mask, top_k=3)
+
+    assert full_pruned == 0
+    assert len(top) == 3
+    assert pruned == len(full) - 3
+    assert top[0] == full[0]
+    assert bank.rank_with_pruning(mask, top_k=len(full) + 5) == (full, 0)
+
+
+def test_top_k_scores_small_banks_in_full() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "heart_v1.png"))
+    full, _ = bank.rank_with_pruning(mask)
+
+    assert not bank.prunes(len(full), 3)
+    assert bank.rank_with_pruning(mask, top_k=3) == (full[:3], 0)
+    assert bank.rank_chamfer(mask, top_k=3) == (bank.rank_chamfer(mask)[0][:3], 0)
+
+
+def test_chamfer_tolerates_small_offsets() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "heart_v1.png"))
+    shifted = np.roll(mask, (4, 3), axis=(0, 1))
+
+    exact, _ = bank.rank_chamfer(mask)
+    moved, pruned = bank.rank_chamfer(shifted)
+
+    assert exact[0].template_id == moved[0].template_id == "heart_v1"
+    assert exact[0].score == 100.0
+    assert moved[0].score > bank.rank(shifted)[0].score
+    assert pruned == 0
+    assert bank.score_chamfer(shifted, bank.get("heart_v1")) == moved[0]
+    pruning = TemplateBank(TEMPLATES_DIR, prune_factor=1)
+    assert pruning.rank_chamfer(mask, top_k=2)[1] == len(exact) - 2
+
+
+def test_compiled_bank_is_memory_mapped_and_scores_identically(tmp_path: Path) -> None:
+    for png in TEMPLATES_DIR.glob("*.png"):
+        shutil.copy2(png, tmp_path / png.name)
+    compiled = tmp_path / "bank.wbt"
+    header = TemplateBank(tmp_path, compiled_path=compiled).compile()
+    expected = sorted(p.stem for p in TEMPLATES_DIR.glob("*.png"))
+    assert [t["template_id"] for t in header["templates"]] == expected
+
+    mapped = TemplateBank(tmp_path, recheck_ms=0, compiled_path=compiled)
+    decoded = TemplateBank(tmp_path)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "heart_v1.png"))
+    assert isinstance(mapped.get("heart_v1").packed, np.memmap)
+    for method in ("raster", "chamfer"):
+        expected = decoded.evaluate(method, draw_mask=mask, top_k=3)
+        assert mapped.evaluate(method, draw_mask=mask, top_k=3) == expected
+
+    # A PNG changed after compiling is decoded again; the rest still come from the file.
+    shutil.copy2(TEMPLATES_DIR / "heart_v1.png", tmp_path / "circle_v1.png")
+    st = os.stat(tmp_path / "circle_v1.png")
+    os.utime(tmp_path / "circle_v1.png", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert mapped.get("circle_v1").packed.tolist() == mapped.get("heart_v1").packed.tolist()
+    assert isinstance(mapped.get("star_v1").packed, np.memmap)
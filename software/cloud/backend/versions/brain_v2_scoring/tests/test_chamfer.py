@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import numpy as np
+
+from brain.scoring.chamfer import (
+    DT_SCALE,
+    chamfer_distances,
+    distance_transform,
+    pack_distance_transform,
+)
+
+
+def test_distance_transform_is_euclidean() -> None:
+    mask = np.zeros((5, 6), dtype=bool)
+    mask[2, 3] = True
+    mask[0, 0] = True
+
+    dt = distance_transform(mask)
+
+    ys, xs = np.mgrid[0:5, 0:6]
+    expected = np.minimum(np.hypot(ys - 2, xs - 3), np.hypot(ys, xs))
+    assert np.allclose(dt, expected)
+
+
+def test_chamfer_distance_is_mean_template_distance_at_drawing_pixels() -> None:
+    template = np.zeros((8, 8), dtype=bool)
+    template[4, :] = True
+    drawing = np.zeros((8, 8), dtype=bool)
+    drawing[1, 2] = drawing[4, 5] = True
+
+    dts = np.stack([pack_distance_transform(template), pack_distance_transform(drawing)], axis=1)
+    distances = chamfer_distances(drawing, dts)
+
+    assert distances[0] == (3 + 0) / 2
+    assert distances[1] == 0
+    assert np.isinf(chamfer_distances(np.zeros((8, 8), dtype=bool), dts)).all()
+    assert pack_distance_transform(np.zeros((8, 8), dtype=bool)).max() == 255 == 63.75 * DT_SCALE
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from PIL import Image
+
+from brain.render.image_cache import EncodedImage, EncodedImageCache, encode_png
+
+
+def test_cache_evicts_least_recently_used_within_byte_budget() -> None:
+    cache = EncodedImageCache(max_bytes=10)
+    cache.put("a", EncodedImage(data=b"1234", etag='"a"'))
+    cache.put("b", EncodedImage(data=b"1234", etag='"b"'))
+    assert cache.get("a") is not None  # "b" is now least recently used
+
+    cache.put("c", EncodedImage(data=b"1234", etag='"c"'))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.snapshot()["bytes"] == 8
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_encode_png_etag_tracks_content() -> None:
+    black = encode_png(Image.new("L", (8, 8), 0))
+    white = encode_png(Image.new("L", (8, 8), 255))
+
+    assert black.data.startswith(b"\x89PNG")
+    assert black.etag == encode_png(Image.new("L", (8, 8), 0)).etag
+    assert black.etag != white.etag
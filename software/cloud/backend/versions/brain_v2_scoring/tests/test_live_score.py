@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import math
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from brain.core.points import PointRing, to_q15
+from brain.render.rasterize import IncrementalCanvas
+from brain.scoring import LiveScore, TemplateBank
+
+TEMPLATES_DIR = ROOT / "data" / "templates"
+
+
+def test_live_score_tracks_full_image_score_tick_by_tick() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    template = bank.get("circle_v1")
+    live = LiveScore(template)
+    canvas = IncrementalCanvas(size=256, stroke=3)
+    ring = PointRing(capacity=5000)
+
+    for i in range(400):
+        a = 2.0 * math.pi * i / 399
+        ring.append(to_q15(0.5 + 0.4 * math.cos(a)), to_q15(0.5 + 0.4 * math.sin(a)), 1000 + i)
+        if i % 37 == 0 or i == 399:
+            img = canvas.update(ring.x_q, ring.y_q, ring.total)
+            live.update(img, canvas.dirty, canvas.cleared)
+            assert live.result() == bank.score_image(img, template)
+
+    assert live.draw_on > 0
+
+
+def test_live_score_restarts_when_the_canvas_is_cleared() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    template = bank.get("heart_v1")
+    live = LiveScore(template)
+    canvas = IncrementalCanvas(size=256, stroke=3)
+    ring = PointRing(capacity=16)
+
+    ring.append(to_q15(0.2), to_q15(0.2), 0)
+    img = canvas.update(ring.x_q, ring.y_q, ring.total)  # a lone point is drawn as a dot
+    live.update(img, canvas.dirty, canvas.cleared)
+    ring.append(to_q15(0.6), to_q15(0.7), 1)
+    img = canvas.update(ring.x_q, ring.y_q, ring.total)
+    live.update(img, canvas.dirty, canvas.cleared)
+
+    assert canvas.cleared
+    assert live.result() == bank.score_image(img, template)
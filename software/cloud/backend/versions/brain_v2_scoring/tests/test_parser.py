@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from brain.ingest.parser import (
+    PEN_DOWN,
+    STROKE_END,
+    WB_MAGIC,
+    WB_STRUCT,
+    WB_VERSION,
+    parse_packet,
+    parse_packets_batch,
+)
+
+
+def _packet(
+    pkt_no: int,
+    x_q: int = 1000,
+    y_q: int = 2000,
+    flags: int = PEN_DOWN,
+    magic: int = WB_MAGIC,
+) -> bytes:
+    return WB_STRUCT.pack(magic, WB_VERSION, flags, 3, 7, pkt_no, 42, x_q, y_q, 1000 + pkt_no)
+
+
+def test_parse_packets_batch_matches_parse_packet() -> None:
+    packets = [_packet(i, x_q=i * 100, y_q=32767 - i) for i in range(10)]
+    packets.append(_packet(10, flags=STROKE_END))
+
+    batch = parse_packets_batch(packets)
+
+    assert len(batch) == len(packets)
+    assert list(batch.events()) == [parse_packet(p) for p in packets]
+    assert batch.x_q.tolist() == [i * 100 for i in range(10)] + [1000]
+    assert batch.t_ms.tolist() == [1000 + i for i in range(11)]
+
+
+def test_parse_packets_batch_drops_invalid_records() -> None:
+    packets = [
+        _packet(0),
+        _packet(1, magic=0x1234),
+        _packet(2, x_q=-1),
+        b"0.1,0.2,1000,1",
+        _packet(3),
+    ]
+
+    from_list = parse_packets_batch(packets)
+    from_buffer = parse_packets_batch(b"".join(p for p in packets if len(p) == WB_STRUCT.size))
+
+    assert from_list.packet_number.tolist() == [0, 3]
+    assert from_buffer.packet_number.tolist() == [0, 3]
+    assert from_list.wand.tolist() == [7, 7]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import math
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import numpy as np
+
+from brain.core.points import to_q15
+from brain.scoring import TemplateBank
+from brain.scoring.pointcloud import cloud_from_points, resample
+
+TEMPLATES_DIR = ROOT / "data" / "templates"
+
+
+def _circle(cx: float, cy: float, r: float, n: int = 300) -> tuple[np.ndarray, np.ndarray]:
+    angles = [2.0 * math.pi * i / n for i in range(n + 1)]
+    xs = np.array([to_q15(cx + r * math.cos(a)) for a in angles])
+    ys = np.array([to_q15(cy + r * math.sin(a)) for a in angles])
+    return xs, ys
+
+
+def test_resample_spaces_points_evenly_along_the_path() -> None:
+    path = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 2.0]])
+
+    out = resample(path, n=7)
+
+    assert out.shape == (7, 2)
+    assert np.allclose(np.hypot(*np.diff(out, axis=0).T), 0.5)
+    assert out[0].tolist() == [0.0, 0.0] and out[-1].tolist() == [1.0, 2.0]
+    assert np.allclose(resample(np.array([[3.0, 4.0]] * 5), n=4), [[3.0, 4.0]] * 4)
+
+
+def test_cloud_is_invariant_to_offset_and_scale() -> None:
+    big = cloud_from_points(*_circle(0.5, 0.5, 0.4))
+    small = cloud_from_points(*_circle(0.2, 0.75, 0.1))
+
+    assert np.allclose(big, small, atol=1e-3)
+
+
+def test_pointcloud_ranking_finds_offset_circle() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    cloud = cloud_from_points(*_circle(0.25, 0.7, 0.15), n=bank.cloud_points)
+
+    ranked = bank.rank_clouds(cloud)
+
+    assert ranked[0].template_id == "circle_v1"
+    assert [r.score for r in ranked] == sorted((r.score for r in ranked), reverse=True)
+    assert bank.score_cloud(cloud, bank.get("circle_v1")) == ranked[0]
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from brain.core.points import PointRing
+
+
+def test_point_ring_keeps_latest_points_as_contiguous_views() -> None:
+    ring = PointRing(capacity=4)
+    for i in range(10):
+        ring.append(i * 10, i * 20, 1000 + i)
+
+    assert len(ring) == 4
+    assert ring.total == 10
+    assert ring.x_q.tolist() == [60, 70, 80, 90]
+    assert ring.y_q.tolist() == [120, 140, 160, 180]
+    assert ring.t_ms.tolist() == [1006, 1007, 1008, 1009]
+    assert ring.x_q.base is not None  # a view, not a copy
+    assert ring[0][2] == 1006
+    assert ring[-1] == (90 / 32767, 180 / 32767, 1009)
+
+
+def test_point_ring_partial_fill() -> None:
+    ring = PointRing(capacity=8)
+    assert not ring
+    ring.append(1, 2, 3)
+    ring.append(4, 5, 6)
+
+    assert len(ring) == 2
+    assert ring.to_points() == [(1 / 32767, 2 / 32767, 3), (4 / 32767, 5 / 32767, 6)]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import pytest
+from PIL import Image
+
+from brain.scoring import TemplateBank, cloud_from_mask, image_to_bin
+from brain.scoring.pool import ScoringPool
+
+TEMPLATES_DIR = ROOT / "data" / "templates"
+
+
+def test_pool_matches_in_process_bank() -> None:
+    bank = TemplateBank(TEMPLATES_DIR)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "heart_v1.png"))
+    cloud = cloud_from_mask(mask)
+    pool = ScoringPool(TEMPLATES_DIR, workers=1, max_in_flight=1)
+    try:
+        for method in ("raster", "chamfer", "pointcloud"):
+            assert pool.evaluate(method, draw_mask=mask, cloud=cloud, top_k=3) == bank.evaluate(
+                method, draw_mask=mask, cloud=cloud, top_k=3
+            )
+        assert pool.evaluate("raster", draw_mask=mask, template_id="star_v1") == bank.evaluate(
+            "raster", draw_mask=mask, template_id="star_v1"
+        )
+        with pytest.raises(KeyError):
+            pool.evaluate("raster", draw_mask=mask, template_id="missing")
+    finally:
+        pool.stop()
+
+    stats = pool.snapshot()
+    assert stats["completed"] == 4
+    assert stats["failed"] == 1
+    assert stats["max_in_flight_seen"] == 1
+    assert stats["running"] is False
+
+
+def test_workers_reload_when_the_callers_bank_changed(tmp_path) -> None:
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "heart_v1.png").write_bytes((TEMPLATES_DIR / "heart_v1.png").read_bytes())
+    bank = TemplateBank(template_dir, recheck_ms=60_000)
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "star_v1.png"))
+    pool = ScoringPool(template_dir, workers=1, recheck_ms=60_000)
+    try:
+        pool.start()
+        (template_dir / "star_v1.png").write_bytes((TEMPLATES_DIR / "star_v1.png").read_bytes())
+        bank.refresh(force=True)
+
+        # The worker's own recheck timer hasn't fired yet.
+        with pytest.raises(KeyError):
+            pool.evaluate("raster", draw_mask=mask, template_id="star_v1")
+        results, _ = pool.evaluate(
+            "raster", draw_mask=mask, template_id="star_v1", bank_id=bank.fingerprint
+        )
+        assert results == bank.evaluate("raster", draw_mask=mask, template_id="star_v1")[0]
+    finally:
+        pool.stop()
+
+
+def test_pool_is_not_restarted_after_stop() -> None:
+    mask = image_to_bin(Image.open(TEMPLATES_DIR / "heart_v1.png"))
+    pool = ScoringPool(TEMPLATES_DIR, workers=1)
+    pool.start()
+    pool.stop()
+
+    with pytest.raises(RuntimeError):
+        pool.evaluate("raster", draw_mask=mask)
+    with pytest.raises(RuntimeError):
+        pool.start()
+    assert pool.snapshot()["running"] is False
+
+
+def test_snapshot_does_not_wait_for_workers_to_start(monkeypatch) -> None:
+    pool = ScoringPool(TEMPLATES_DIR, workers=1)
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_executor():
+        building.set()
+        release.wait(timeout=5.0)
+        return ThreadPoolExecutor(max_workers=1)
+
+    monkeypatch.setattr(pool, "_new_executor", slow_executor)
+    starter = threading.Thread(target=pool.start)
+    starter.start()
+    try:
+        assert building.wait(timeout=5.0)
+        assert pool.snapshot()["running"] is False
+    finally:
+        release.set()
+        starter.join(timeout=5.0)
+    assert pool.snapshot()["running"] is True
+    pool.stop()
+
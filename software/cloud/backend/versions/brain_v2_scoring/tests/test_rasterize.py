@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import math
 import sys
 from pathlib import Path
 
@@ -9,7 +10,10 @@ SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
 
-from brain.render.rasterize import rasterize
+import numpy as np
+
+from brain.core.points import PointRing
+from brain.render.rasterize import IncrementalCanvas, rasterize, rasterize_q15
 
 
 def test_rasterize_duplicate_points_produces_nonempty_image() -> None:
@@ -25,3 +29,58 @@ def test_rasterize_duplicate_points_produces_nonempty_image() -> None:
 
     assert img.size == (256, 256)
     assert max(img.getdata()) > 0
+
+
+def test_rasterize_q15_matches_rasterize() -> None:
+    x_q = np.array([0, 1200, 8000, 16383, 16384, 30000, 32767, 32767], dtype=np.int16)
+    y_q = np.array([32767, 20000, 100, 16384, 16383, 5000, 0, 12], dtype=np.int16)
+    points = [
+        (x / 32767.0, y / 32767.0, i) for i, (x, y) in enumerate(zip(x_q.tolist(), y_q.tolist()))
+    ]
+
+    for normalize_view in (True, False):
+        expected = rasterize(points, size=256, stroke=3, normalize_view=normalize_view)
+        actual = rasterize_q15(x_q, y_q, size=256, stroke=3, normalize_view=normalize_view)
+        assert actual.tobytes() == expected.tobytes()
+
+    single = rasterize_q15(x_q[:1], y_q[:1], size=256, stroke=3, normalize_view=False)
+    expected = rasterize(points[:1], size=256, stroke=3, normalize_view=False)
+    assert single.tobytes() == expected.tobytes()
+
+
+def test_incremental_canvas_matches_full_rasterize() -> None:
+    ring = PointRing(capacity=1000)
+    canvas = IncrementalCanvas(size=256, stroke=3)
+    chunk_sizes = [1, 1, 2, 5, 3, 17, 1, 40, 9]
+    i = 0
+    for n in chunk_sizes * 4:
+        for _ in range(n):
+            ang = 4.0 * math.pi * i / 300.0
+            r = 0.1 + 0.35 * i / 300.0
+            x, y = 0.5 + r * math.cos(ang), 0.5 + r * math.sin(ang)
+            ring.append(int(x * 32767), int(y * 32767), i)
+            i += 1
+        canvas.update(ring.x_q, ring.y_q, ring.total)
+
+    expected = rasterize_q15(ring.x_q, ring.y_q, size=256, stroke=3, normalize_view=False)
+    assert canvas.img.tobytes() == expected.tobytes()
+
+
+def test_incremental_canvas_redraws_when_the_ring_overflows() -> None:
+    ring = PointRing(capacity=50)
+    canvas = IncrementalCanvas(size=256, stroke=3)
+    for i in range(30):
+        ring.append(1000 + 300 * i, 1000, i)
+    canvas.update(ring.x_q, ring.y_q, ring.total)
+
+    # More than a ring's worth of points between two updates: the old tail
+    # must not be joined to the new window.
+    for i in range(120):
+        ring.append(2000 + 200 * i, 31000, 100 + i)
+    canvas.update(ring.x_q, ring.y_q, ring.total)
+
+    assert canvas.cleared
+    assert canvas.drawn == ring.total
+    expected = rasterize_q15(ring.x_q, ring.y_q, size=256, stroke=3, normalize_view=False)
+    assert canvas.img.tobytes() == expected.tobytes()
+
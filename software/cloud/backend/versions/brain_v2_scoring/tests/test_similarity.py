@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import math
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from PIL import Image
+
+from brain.render.rasterize import rasterize
+from brain.scoring import ScoreResult, compute_score, compute_score_raster
+
+TEMPLATES_DIR = ROOT / "data" / "templates"
+
+
+def _reference_score(drawing_path: Path, template_path: Path) -> ScoreResult:
+    """The original pixel-loop implementation, kept to pin the metrics."""
+
+    def to_bin(path: Path) -> Image.Image:
+        img = Image.open(path).convert("L").resize((256, 256))
+        return img.point(lambda px: 255 if px > 10 else 0, mode="1")
+
+    draw_bin = to_bin(drawing_path)
+    tmpl_bin = to_bin(template_path)
+    draw_on = sum(1 for v in draw_bin.getdata() if v)
+    tmpl_on = sum(1 for v in tmpl_bin.getdata() if v)
+    inter = 0
+    union = 0
+    for pa, pb in zip(draw_bin.getdata(), tmpl_bin.getdata()):
+        if pa and pb:
+            inter += 1
+        if pa or pb:
+            union += 1
+
+    iou = (inter / union) if union else 0.0
+    dice = (2.0 * inter / (draw_on + tmpl_on)) if (draw_on + tmpl_on) else 0.0
+    area_ratio = (min(draw_on, tmpl_on) / max(draw_on, tmpl_on)) if max(draw_on, tmpl_on) else 0.0
+    score = 100.0 * (0.55 * dice + 0.35 * iou + 0.10 * area_ratio)
+    template_id = template_path.stem
+    return ScoreResult(
+        template_id=template_id,
+        template_name=template_id.replace("_", " ").title(),
+        score=round(score, 3),
+        metrics={
+            "dice": round(dice, 4),
+            "iou": round(iou, 4),
+            "area_ratio": round(area_ratio, 4),
+            "draw_pixels_on": draw_on,
+            "template_pixels_on": tmpl_on,
+            "intersection_pixels": inter,
+            "union_pixels": union,
+        },
+    )
+
+
+def _drawings(tmp_path: Path) -> list[Path]:
+    out = []
+    heart = []
+    for i in range(300):
+        t = 2.0 * math.pi * i / 299.0
+        x = 16 * math.sin(t) ** 3
+        y = 13 * math.cos(t) - 5 * math.cos(2 * t) - 2 * math.cos(3 * t) - math.cos(4 * t)
+        heart.append((0.5 + x / 18.0 * 0.38, 0.5 - (y - 2.0) / 18.0 * 0.38, i))
+    circle = [
+        (0.5 + 0.3 * math.cos(i / 20.0), 0.5 + 0.3 * math.sin(i / 20.0), i) for i in range(130)
+    ]
+    for name, points, normalize_view in (
+        ("heart", heart, False),
+        ("circle", circle, True),
+        ("empty", [], False),
+    ):
+        path = tmp_path / f"{name}.png"
+        rasterize(points, size=256, stroke=3, normalize_view=normalize_view).save(path)
+        out.append(path)
+    # A drawing saved at another size exercises the resize path.
+    small = tmp_path / "small.png"
+    rasterize(heart, size=128, stroke=2).save(small)
+    out.append(small)
+    return out
+
+
+def test_compute_score_matches_reference_implementation(tmp_path: Path) -> None:
+    templates = sorted(TEMPLATES_DIR.glob("*.png"))
+    assert templates
+
+    for drawing in _drawings(tmp_path):
+        for template in templates:
+            assert compute_score(drawing, template) == _reference_score(drawing, template)
+
+
+def test_compute_score_raster_matches_compute_score(tmp_path: Path) -> None:
+    template = TEMPLATES_DIR / "heart_v1.png"
+    for drawing in _drawings(tmp_path):
+        img = Image.open(drawing)
+        img.load()
+        assert compute_score_raster(img, template) == compute_score(drawing, template)
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import sys
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import brain.api.server as server
+from brain.core.points import to_q15
+from brain.ingest.parser import PEN_DOWN, STROKE_END, WB_MAGIC, WB_STRUCT, WB_VERSION, PointEvent
+from brain.render.rasterize import rasterize_q15
+
+
+def _event(wand_id: int, t_ms: int, flags: int = PEN_DOWN, stroke_id: int = 5) -> PointEvent:
+    return PointEvent(
+        device_number=1,
+        wand_id=wand_id,
+        stroke_id=stroke_id,
+        packet_number=t_ms,
+        x=(t_ms % 100) / 100.0,
+        y=0.5,
+        timestamp_ms=t_ms,
+        flags=flags,
+        pen_down=bool(flags & PEN_DOWN),
+        stroke_start=False,
+        stroke_end=bool(flags & STROKE_END),
+    )
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch) -> server.BrainState:
+    monkeypatch.setattr(server, "OUTDIR", tmp_path)
+    return server.BrainState()
+
+
+def test_explicit_end_finalizes_attempt(state: server.BrainState) -> None:
+    for t in range(10):
+        state.on_event(_event(1, 1000 + t))
+    state.on_event(_event(1, 1010, flags=STROKE_END))
+
+    ws = state.wand_payload(1)
+    assert ws["active"] is False
+    assert ws["last_close_reason"] == "explicit_end"
+    res = state.last_result[(1, 1)]
+    assert res.num_points == 10
+    assert Path(res.render_path).exists()
+
+
+def test_finalize_hooks_get_the_in_memory_raster(state: server.BrainState, monkeypatch) -> None:
+    seen = []
+    original = state._finalize_locked
+
+    def hook(device, wand, attempt_id, close_reason):
+        res = original(device, wand, attempt_id, close_reason)
+        seen.append(res.raster.copy())
+        return res
+
+    monkeypatch.setattr(state, "_finalize_locked", hook)
+    for t in range(5):
+        state.on_event(_event(1, 1000 + t))
+    state.on_event(_event(1, 1005, flags=STROKE_END))
+
+    res = state.last_result[(1, 1)]
+    assert res.raster is None
+    assert seen[0].tobytes() == Image.open(res.render_path).tobytes()
+
+
+def test_finalized_image_covers_the_ring_points(state: server.BrainState, monkeypatch) -> None:
+    monkeypatch.setattr(server, "MAX_ATTEMPT_POINTS", 30)
+    for t in range(80):
+        # The first 50 points rotate out of the ring before finalize.
+        state.on_event(replace(_event(1, 1000 + t), x=t / 100.0, y=0.1 if t < 50 else 0.9))
+    state.on_event(_event(1, 1080, flags=STROKE_END))
+
+    res = state.last_result[(1, 1)]
+    assert res.num_points == 30
+    assert res.start_ms == 1050
+    x_q = np.array([to_q15(t / 100.0) for t in range(50, 80)])
+    y_q = np.full(30, to_q15(0.9))
+    expected = rasterize_q15(x_q, y_q, size=256, stroke=3, normalize_view=False)
+    assert Image.open(res.render_path).tobytes() == expected.tobytes()
+
+
+def test_finalizing_one_wand_does_not_block_another(state: server.BrainState, monkeypatch) -> None:
+    entered = threading.Event()
+    release = threading.Event()
+    original = state._finalize_locked
+
+    def slow_finalize(device, wand, attempt_id, close_reason):
+        if wand == 1:
+            entered.set()
+            release.wait(5.0)
+        return original(device, wand, attempt_id, close_reason)
+
+    monkeypatch.setattr(state, "_finalize_locked", slow_finalize)
+    for t in range(5):
+        state.on_event(_event(1, 1000 + t))
+    finalizer = threading.Thread(target=state.on_event, args=(_event(1, 1005, flags=STROKE_END),))
+    finalizer.start()
+    try:
+        assert entered.wait(1.0)
+
+        # Wand 1's shard lock is held by the stalled finalize.
+        other = threading.Thread(
+            target=lambda: [state.on_event(_event(2, 2000 + t)) for t in range(5)]
+        )
+        other.start()
+        other.join(timeout=2.0)
+        assert not other.is_alive()
+        assert state.wand_payload(2)["current_points"] == 5
+        # Readers get wand 1's last published status instead of waiting.
+        assert state.wand_payload(1)["active"] is True
+    finally:
+        release.set()
+        finalizer.join(timeout=5.0)
+
+    assert state.wand_payload(1)["last_close_reason"] == "explicit_end"
+
+
+def test_new_stroke_id_replaces_the_active_attempt(state: server.BrainState) -> None:
+    for t in range(4):
+        state.on_event(_event(1, 1000 + t, stroke_id=5))
+    state.on_event(_event(2, 1500, stroke_id=5))
+    first = state.shards[1].status.current_attempt_id
+
+    state.on_event(_event(1, 1100, stroke_id=6))
+
+    replaced = state.attempt_index[first]
+    assert replaced.close_reason == "attempt_replaced"
+    assert replaced.num_points == 4
+    shard = state.shards[1]
+    second = shard.status.current_attempt_id
+    assert second not in (None, first)
+    assert list(shard.attempts) == [(1, 1, second)]
+    assert state.wand_payload(1)["current_points"] == 1
+    # The other wand's attempt in its own shard is untouched.
+    assert state.wand_payload(2)["active"] is True
+    assert state.wand_payload(2)["current_points"] == 1
+
+
+def test_udp_batch_mixing_formats_keeps_arrival_order(monkeypatch) -> None:
+    queued = []
+
+    class _Queue:
+        def put(self, ev):
+            queued.append(ev)
+
+        def put_many(self, events):
+            queued.extend(events)
+
+    monkeypatch.setattr(server, "ingest_queue", _Queue())
+
+    def binary(t_ms: int) -> bytes:
+        return WB_STRUCT.pack(WB_MAGIC, WB_VERSION, PEN_DOWN, 1, 7, t_ms, 5, 1000, 2000, t_ms)
+
+    datagrams = [binary(1), binary(2), b"0.5,0.5,3,7", binary(4), b"0.5,0.5,5,7", b"0.5,0.5,6,7"]
+    server.on_udp_batch([(memoryview(d), ("127.0.0.1", 41000)) for d in datagrams])
+
+    assert [ev.timestamp_ms for ev in queued] == [1, 2, 3, 4, 5, 6]
+
+
+def test_idle_deadline_is_lazily_extended_by_new_points(state: server.BrainState) -> None:
+    for t in range(3):
+        state.on_event(_event(1, 1000 + t))
+    state.on_event(_event(2, 2000))
+    state.on_event(_event(2, 2001))
+
+    shard = state.shards[1]
+    attempt_id = shard.status.current_attempt_id
+    buf = next(iter(shard.attempts.values()))
+    first_deadline = buf.last_arrival_ms + state.idle_finalize_ms
+
+    # A later point pushes wand 1's real deadline out; its heap entry is stale.
+    buf.last_arrival_ms += 500
+    state._finalize_idle_attempts(first_deadline)
+    assert state.wand_payload(1)["active"] is True
+    assert (buf.last_arrival_ms + state.idle_finalize_ms, 1, attempt_id) in state._idle_deadlines
+
+    state._finalize_idle_attempts(first_deadline + 500)
+    assert state.wand_payload(1)["last_close_reason"] == "idle_timeout"
+    assert state.wand_payload(2)["last_close_reason"] == "idle_timeout"
+    assert state._idle_deadlines == []
+
+
+def test_live_image_is_served_from_memory_with_etag(state: server.BrainState, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "state", state)
+    for t in range(3):
+        state.on_event(_event(4, 1000 + t))
+
+    client = TestClient(server.app)
+    first = client.get("/api/v1/wand/4/live.png")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    assert list(server.OUTDIR.iterdir()) == []
+
+    again = client.get("/api/v1/wand/4/live.png", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_repeated_score_requests_hit_the_cache(state: server.BrainState, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "state", state)
+    monkeypatch.setattr(server, "template_bank", server.TemplateBank(ROOT / "data" / "templates"))
+    monkeypatch.setattr(server, "score_cache", server.ScoreCache(8))
+    for t in range(20):
+        state.on_event(_event(5, 1000 + t))
+    state.on_event(_event(5, 1020, flags=STROKE_END))
+
+    client = TestClient(server.app)
+    first = client.get("/api/v2/score/latest", params={"wand_id": 5})
+    second = client.get("/api/v2/score/latest", params={"wand_id": 5})
+
+    assert first.status_code == 200
+    assert first.json() == second.json()
+    assert server.score_cache.snapshot()["hits"] == 1
+    assert server.score_cache.snapshot()["misses"] == 1
+
+
+def test_score_reads_the_finalized_mask_not_the_png(state: server.BrainState, monkeypatch) -> None:
+    monkeypatch.setattr(server, "template_bank", server.TemplateBank(ROOT / "data" / "templates"))
+    for t in range(20):
+        state.on_event(_event(8, 1000 + t))
+    state.on_event(_event(8, 1020, flags=STROKE_END))
+    res = state.last_result[(1, 8)]
+
+    with Image.open(res.render_path) as img:
+        from_png = server.image_to_bin(img)
+    assert (server._draw_mask(res) == from_png).all()
+
+    expected = server._compute_score_payload(res, None, 3, "raster")
+    Path(res.render_path).unlink()
+    assert server._compute_score_payload(res, None, 3, "raster") == expected
+
+    # Without a mask the PNG is still the fallback.
+    with pytest.raises(FileNotFoundError):
+        server._compute_score_payload(replace(res, mask=None), None, 3, "raster")
+
+
+def test_score_method_selects_pointcloud_engine(state: server.BrainState, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "state", state)
+    monkeypatch.setattr(server, "template_bank", server.TemplateBank(ROOT / "data" / "templates"))
+    monkeypatch.setattr(server, "score_cache", server.ScoreCache(8))
+    for t in range(20):
+        state.on_event(_event(6, 1000 + t))
+    state.on_event(_event(6, 1020, flags=STROKE_END))
+
+    client = TestClient(server.app)
+    raster = client.get("/api/v2/score/latest", params={"wand_id": 6})
+    cloud = client.get("/api/v2/score/latest", params={"wand_id": 6, "method": "pointcloud"})
+    chamfer = client.get("/api/v2/score/latest", params={"wand_id": 6, "method": "chamfer"})
+    bad = client.get("/api/v2/score/latest", params={"wand_id": 6, "method": "nope"})
+
+    assert raster.json()["method"] == "raster"
+    assert cloud.status_code == 200
+    assert cloud.json()["method"] == "pointcloud"
+    assert "mean_distance" in cloud.json()["best"]["metrics"]
+    assert chamfer.json()["method"] == "chamfer"
+    assert "chamfer_px" in chamfer.json()["best"]["metrics"]
+    assert bad.status_code == 400
+
+
+def test_live_score_is_published_while_drawing(state: server.BrainState, monkeypatch) -> None:
+    monkeypatch.setattr(server, "template_bank", server.TemplateBank(ROOT / "data" / "templates"))
+    monkeypatch.setattr(state, "live_template_for", lambda device, wand, attempt_id: "heart_v1")
+
+    state.on_event(_event(7, 1000))
+    ws = state.wand_payload(7)
+    assert ws["live_template_id"] == "heart_v1"
+    assert ws["live_score"] is not None
+
+    state.on_event(_event(7, 1001, flags=STROKE_END))
+    ws = state.wand_payload(7)
+    assert ws["live_template_id"] is None
+    assert ws["live_score"] is None
+
+
+def test_template_upload_rebuilds_the_compiled_bank(tmp_path, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    compiled = tmp_path / "template_bank.wbt"
+    monkeypatch.setattr(server, "TEMPLATES_DIR", templates)
+    monkeypatch.setattr(server, "TEMPLATE_BANK_FILE", compiled)
+    bank = server.TemplateBank(templates, recheck_ms=0, compiled_path=compiled)
+    monkeypatch.setattr(server, "template_bank", bank)
+
+    client = TestClient(server.app)
+    png = (ROOT / "data" / "templates" / "star_v1.png").read_bytes()
+    uploaded = client.put("/api/v2/template/my_star/image.png", content=png)
+    assert uploaded.status_code == 200
+    assert uploaded.json()["bank"]["count"] == 1
+    assert compiled.exists()
+    assert [t.template_id for t in server.template_bank.templates()] == ["my_star"]
+
+    assert client.put("/api/v2/template/bad.id/image.png", content=png).status_code == 400
+    assert client.put("/api/v2/template/junk/image.png", content=b"not an image").status_code == 400
+    assert client.post("/api/v2/templates/compile").json()["count"] == 1
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import socket
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from brain.ingest.udp_rx import UdpReceiver
+
+
+def test_batched_receive_drains_all_pending_datagrams() -> None:
+    batches: list[list[bytes]] = []
+
+    def on_batch(batch) -> None:
+        batches.append([bytes(view) for view, _addr in batch])
+        rx.stop()
+
+    rx = UdpReceiver(host="127.0.0.1", port=0, bufsize=64, on_batch=on_batch, batch_size=8)
+    sock = rx._open_socket()
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for i in range(5):
+            tx.sendto(bytes([i]) * 24, sock.getsockname())
+        rx._run_batched(sock)
+    finally:
+        tx.close()
+        sock.close()
+
+    assert batches == [[bytes([i]) * 24 for i in range(5)]]
+    assert rx.stats.batches == 1
+    assert rx.stats.datagrams == 5
+    assert rx.stats.bytes == 5 * 24
+    assert rx.latest.raw == bytes([4]) * 24
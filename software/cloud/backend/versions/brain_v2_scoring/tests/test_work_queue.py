@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import sys
+import threading
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from brain.ingest.work_queue import DROP_NEWEST, DROP_OLDEST, BoundedWorkQueue
+
+
+def test_drop_oldest_keeps_most_recent_items() -> None:
+    handled: list[int] = []
+    q = BoundedWorkQueue(handler=handled.append, maxsize=3, policy=DROP_OLDEST)
+
+    assert q.put_many(range(5)) == 5
+    q.start()
+    q.stop()
+
+    assert handled == [2, 3, 4]
+    snap = q.snapshot()
+    assert snap["dropped"] == 2
+    assert snap["processed"] == 3
+    assert snap["max_depth"] == 3
+    assert snap["depth"] == 0
+
+
+def test_drop_newest_refuses_items_when_full() -> None:
+    handled: list[int] = []
+    q = BoundedWorkQueue(handler=handled.append, maxsize=3, policy=DROP_NEWEST)
+
+    assert q.put_many(range(5)) == 3
+    q.start()
+    q.stop()
+
+    assert handled == [0, 1, 2]
+    assert q.snapshot()["dropped"] == 2
+
+
+def test_slow_handler_does_not_block_producer() -> None:
+    release = threading.Event()
+    q = BoundedWorkQueue(handler=lambda _item: release.wait(1.0), maxsize=2)
+    q.start()
+
+    for i in range(100):
+        q.put(i)
+
+    assert q.depth() <= 2
+    release.set()
+    q.stop()
+    assert q.snapshot()["dropped"] >= 97
+
+
+def test_stalled_worker_keeps_backlog_bounded() -> None:
+    entered: list[int] = []
+    in_handler = threading.Condition()
+    permits = threading.Semaphore(0)
+    handled: list[int] = []
+
+    def handler(item: int) -> None:
+        with in_handler:
+            entered.append(item)
+            in_handler.notify_all()
+        permits.acquire(timeout=2.0)
+        handled.append(item)
+
+    def wait_entered(item: int) -> None:
+        with in_handler:
+            assert in_handler.wait_for(lambda: item in entered, timeout=1.0)
+
+    q = BoundedWorkQueue(handler=handler, maxsize=4, policy=DROP_OLDEST)
+    q.start()
+    q.put(0)
+    wait_entered(0)
+    q.put_many(range(1, 5))
+    permits.release()
+    wait_entered(1)
+
+    # Items 2-4 were never started, so they still count against maxsize.
+    q.put_many(range(5, 9))
+    assert q.depth() == 4
+    assert q.snapshot()["dropped"] == 3
+
+    for _ in range(8):
+        permits.release()
+    q.stop()
+    assert handled == [0, 1, 5, 6, 7, 8]
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Scoring benchmark on synthetic attempts.
+
+Builds attempts from the parametric shapes of software/tools/wb_tx_long_noisy_stroke.py
+at several noise levels and point counts, rasterizes them the way the live
+server does, and times every scoring path:
+
+- compute_score: the file-based reference, per template
+- bank_<method>: TemplateBank single-template scoring, per template
+- rank_<method>: whole-bank scoring in one call (plus rank_raster_top<k>)
+- pool_<method>: whole-bank scoring through ScoringPool (with --workers)
+
+Reports p50/p99 latency per template and overall, plus throughput, as JSON.
+
+    python tools/bench_scoring.py --out bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+SHAPE_TOOLS = ROOT.parents[3] / "tools"
+if str(SHAPE_TOOLS) not in sys.path:
+    sys.path.insert(0, str(SHAPE_TOOLS))
+
+import numpy as np
+
+import wb_tx_long_noisy_stroke as strokes
+from brain.core.points import to_q15
+from brain.render.rasterize import rasterize_q15
+from brain.scoring import (
+    SCORE_METHODS,
+    TemplateBank,
+    cloud_from_points,
+    compute_score,
+    image_to_bin,
+)
+from brain.scoring.pool import ScoringPool
+
+SHAPES = ("spiral", "lemniscate", "lissajous", "heart", "circle")
+# Shapes that have a bundled template, for top-1 accuracy.
+EXPECTED_TEMPLATE = {"heart": "heart_v1", "lemniscate": "infinity_v1", "circle": "circle_v1"}
+
+
+def make_attempt(shape: str, points: int, noise_std: float) -> tuple[np.ndarray, np.ndarray]:
+    """Q15 x/y columns of one attempt, using the transmitter's shape and noise model."""
+    xs, ys = [], []
+    for i in range(points):
+        t = i / max(1, points - 1)
+        x, y = strokes.noisy_point(t, shape, noise_std, noise_std / 4.0, (0.0, 0.0))
+        xs.append(to_q15(x))
+        ys.append(to_q15(y))
+    return np.array(xs, dtype=np.int16), np.array(ys, dtype=np.int16)
+
+
+def build_corpus(shapes, point_counts, noise_levels, out_dir: Path) -> list[dict]:
+    corpus = []
+    for shape in shapes:
+        for points in point_counts:
+            for noise in noise_levels:
+                x_q, y_q = make_attempt(shape, points, noise)
+                img = rasterize_q15(x_q, y_q, size=256, stroke=3, normalize_view=False)
+                path = out_dir / f"{shape}_{points}_{noise:g}.png"
+                img.save(path)
+                corpus.append({
+                    "shape": shape,
+                    "points": points,
+                    "noise_std": noise,
+                    "path": path,
+                    "mask": image_to_bin(img),
+                    "cloud": cloud_from_points(x_q, y_q),
+                })
+    return corpus
+
+
+def _summary(samples_ms: list[float]) -> dict:
+    arr = np.asarray(samples_ms)
+    return {
+        "n": int(arr.size),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+        "mean_ms": round(float(arr.mean()), 4),
+        "throughput_per_s": round(1000.0 / float(arr.mean()), 1) if arr.mean() > 0 else None,
+    }
+
+
+def _time(fn: Callable[[], object], repeats: int) -> tuple[list[float], object]:
+    samples, result = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples, result
+
+
+def bench_per_template(name: str, corpus, bank: TemplateBank, score_one, repeats: int) -> dict:
+    per_template: dict[str, list[float]] = {}
+    for attempt in corpus:
+        for template in bank.templates():
+            samples, _ = _time(lambda: score_one(attempt, template), repeats)
+            per_template.setdefault(template.template_id, []).extend(samples)
+    every = [s for samples in per_template.values() for s in samples]
+    return {
+        "engine": name,
+        **_summary(every),
+        "per_template": {tid: _summary(samples) for tid, samples in sorted(per_template.items())},
+    }
+
+
+def bench_whole_bank(name: str, corpus, evaluate, repeats: int) -> dict:
+    every, hits, known = [], 0, 0
+    for attempt in corpus:
+        samples, (results, _pruned) = _time(lambda: evaluate(attempt), repeats)
+        every.extend(samples)
+        expected = EXPECTED_TEMPLATE.get(attempt["shape"])
+        if expected is not None:
+            known += 1
+            hits += results[0].template_id == expected
+    return {
+        "engine": name,
+        **_summary(every),
+        "top1_accuracy": round(hits / known, 4) if known else None,
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    random.seed(args.seed)
+    bank = TemplateBank(Path(args.templates))
+    if not bank.templates():
+        raise SystemExit(f"no templates in {args.templates}")
+
+    report = {
+        "config": {
+            "shapes": args.shapes,
+            "points": args.points,
+            "noise": args.noise,
+            "repeats": args.repeats,
+            "seed": args.seed,
+            "templates": [t.template_id for t in bank.templates()],
+            # top_k pre-screens only banks larger than prune_factor * top_k
+            "prune_factor": bank.prune_factor,
+            "top_k_prunes": bank.prunes(len(bank.templates()), args.top_k),
+            "workers": args.workers,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "engines": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = build_corpus(args.shapes, args.points, args.noise, Path(tmp))
+        report["config"]["attempts"] = len(corpus)
+        engines = report["engines"]
+
+        engines.append(bench_per_template(
+            "compute_score", corpus, bank,
+            lambda a, t: compute_score(a["path"], Path(t.ref.path)), args.repeats,
+        ))
+        for method in SCORE_METHODS:
+            engines.append(bench_per_template(
+                f"bank_{method}", corpus, bank,
+                lambda a, t, m=method: bank.evaluate(
+                    m, draw_mask=a["mask"], cloud=a["cloud"], template_id=t.template_id
+                ),
+                args.repeats,
+            ))
+        for method in SCORE_METHODS:
+            engines.append(bench_whole_bank(
+                f"rank_{method}", corpus,
+                lambda a, m=method: bank.evaluate(m, draw_mask=a["mask"], cloud=a["cloud"]),
+                args.repeats,
+            ))
+        if args.top_k:
+            engines.append(bench_whole_bank(
+                f"rank_raster_top{args.top_k}", corpus,
+                lambda a: bank.evaluate("raster", draw_mask=a["mask"], top_k=args.top_k),
+                args.repeats,
+            ))
+        if args.workers:
+            pool = ScoringPool(Path(args.templates), workers=args.workers)
+            pool.start()
+            try:
+                for method in SCORE_METHODS:
+                    engines.append(bench_whole_bank(
+                        f"pool_{method}", corpus,
+                        lambda a, m=method: pool.evaluate(m, draw_mask=a["mask"], cloud=a["cloud"]),
+                        args.repeats,
+                    ))
+            finally:
+                pool.stop()
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark brain.scoring on synthetic attempts.")
+    p.add_argument(
+        "--templates", default=str(ROOT / "data" / "templates"), help="template PNG directory"
+    )
+    p.add_argument("--shapes", nargs="+", default=list(SHAPES), choices=SHAPES)
+    p.add_argument(
+        "--points", nargs="+", type=int, default=[200, 800, 3000], help="points per attempt"
+    )
+    p.add_argument(
+        "--noise",
+        nargs="+",
+        type=float,
+        default=[0.0, 0.004, 0.012],
+        help="jitter std (normalized units)",
+    )
+    p.add_argument("--repeats", type=int, default=5, help="timed runs per attempt and engine")
+    p.add_argument(
+        "--top-k", type=int, default=3, help="also time raster ranking with this top_k (0 = skip)"
+    )
+    p.add_argument(
+        "--workers", type=int, default=0, help="also time ScoringPool with this many workers"
+    )
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+    return p
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+        for engine in report["engines"]:
+            print(
+                f"{engine['engine']:>22}"
+                f"  p50 {engine['p50_ms']:8.3f} ms  p99 {engine['p99_ms']:8.3f} ms"
+            )
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
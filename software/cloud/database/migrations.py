@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .models import Attempt
+
+logger = logging.getLogger("wand-brain-cloud")
+
+# Keeps the newest row of every (device_number, wand_id, attempt_id) group:
+# latest finalized_at_ms, then highest id.
+_DELETE_DUPLICATE_ATTEMPTS = text(
+    """
+    DELETE FROM attempts WHERE id IN (
+        SELECT older.id FROM attempts AS older
+        JOIN attempts AS newer
+          ON newer.device_number = older.device_number
+         AND newer.wand_id = older.wand_id
+         AND newer.attempt_id = older.attempt_id
+         AND (newer.finalized_at_ms > older.finalized_at_ms
+              OR (newer.finalized_at_ms = older.finalized_at_ms AND newer.id > older.id))
+    )
+    """
+)
+
+
+def _delete_duplicate_attempts(conn: Connection) -> int:
+    return conn.execute(_DELETE_DUPLICATE_ATTEMPTS).rowcount or 0
+
+
+def _add_attempt_updated_at_ms(conn: Connection) -> None:
+    # Rows from before the column existed count as written when finalized.
+    conn.execute(text("ALTER TABLE attempts ADD COLUMN updated_at_ms BIGINT NOT NULL DEFAULT 0"))
+    conn.execute(text("UPDATE attempts SET updated_at_ms = finalized_at_ms"))
+
+
+def migrate(engine: Engine) -> list[str]:
+    """
+    Brings a database created by an older build up to the current columns
+    and indexes.
+
+    create_all() only creates missing tables, so columns and indexes added
+    to existing tables are created here. Duplicate attempt rows, which older
+    builds could write, are removed before the unique index is built. Safe
+    to run on every startup; returns the names of the indexes it created.
+    """
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns(Attempt.__tablename__)}
+    existing = {index["name"] for index in inspector.get_indexes(Attempt.__tablename__)}
+    created = []
+    with engine.begin() as conn:
+        if "updated_at_ms" not in columns:
+            _add_attempt_updated_at_ms(conn)
+            logger.info("Added attempts.updated_at_ms")
+        for index in sorted(Attempt.__table__.indexes, key=lambda i: i.name):
+            if index.name in existing:
+                continue
+            if index.unique:
+                removed = _delete_duplicate_attempts(conn)
+                if removed:
+                    logger.warning(
+                        "Removed %s duplicate attempt rows before creating %s",
+                        removed,
+                        index.name,
+                    )
+            index.create(bind=conn)
+            created.append(index.name)
+    if created:
+        logger.info("Created indexes: %s", ", ".join(created))
+    return created
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, Text
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, String, Text
 from sqlalchemy.sql import func
 
 from .database import Base
@@ -8,6 +8,20 @@ from .database import Base
 
 class Attempt(Base):
     __tablename__ = "attempts"
+    __table_args__ = (
+        # One row per attempt; also the conflict target of the attempt upsert.
+        Index(
+            "uq_attempts_device_wand_attempt",
+            "device_number",
+            "wand_id",
+            "attempt_id",
+            unique=True,
+        ),
+        # Serves the newest-first history listing.
+        Index("ix_attempts_finalized_at_ms", "finalized_at_ms", "id"),
+        # Lets startup backfills find rows written since their watermark.
+        Index("ix_attempts_updated_at_ms", "updated_at_ms"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     wand_id = Column(Integer, index=True, nullable=False)
@@ -22,6 +36,8 @@ class Attempt(Base):
     best_template_id = Column(String, nullable=True)
     best_template_name = Column(String, nullable=True)
     score = Column(Float, nullable=True)
+    # Epoch ms of the last insert or update by the attempt upsert.
+    updated_at_ms = Column(BigInteger, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -40,3 +56,41 @@ class TemplateChampion(Base):
     claimed_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Watermark(Base):
+    """Latest attempt write seen by a startup job, so it can skip work when nothing changed."""
+
+    __tablename__ = "watermarks"
+
+    name = Column(String, primary_key=True)
+    # Highest Attempt.updated_at_ms the job has processed.
+    updated_at_ms = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class LeaderboardEntry(Base):
+    """One attempt on a top-K board: a template's, or a template's for one wand or device."""
+
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        Index(
+            "uq_leaderboard_entries_board_attempt",
+            "template_id", "scope", "scope_id", "device_number", "wand_id", "attempt_id",
+            unique=True,
+        ),
+        Index("ix_leaderboard_entries_board_score", "template_id", "scope", "scope_id", "score"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    template_id = Column(String, nullable=False)
+    template_name = Column(String, nullable=False)
+    scope = Column(String, nullable=False)
+    scope_id = Column(Integer, nullable=False)
+    attempt_id = Column(Integer, nullable=False)
+    wand_id = Column(Integer, nullable=False)
+    device_number = Column(Integer, nullable=False)
+    finalized_at_ms = Column(BigInteger, nullable=False)
+    score = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import heapq
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+# Every scored attempt is ranked on its template's board and on the
+# template's board for its wand and for its device.
+SCOPES = ("all", "wand", "device")
+
+# (template_id, scope, scope_id); scope_id is 0 for "all".
+BoardKey = tuple[str, str, int]
+AttemptKey = tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class BoardEntry:
+    template_id: str
+    template_name: str
+    device_number: int
+    wand_id: int
+    attempt_id: int
+    score: float
+    finalized_at_ms: int
+
+    @property
+    def attempt_key(self) -> AttemptKey:
+        return (self.device_number, self.wand_id, self.attempt_id)
+
+
+@dataclass
+class BoardChanges:
+    """Rows to write and rows to delete after an offer, as (board, entry) pairs."""
+
+    upserts: list[tuple[BoardKey, BoardEntry]] = field(default_factory=list)
+    deletes: list[tuple[BoardKey, BoardEntry]] = field(default_factory=list)
+
+
+def board_keys(template_id: str, device_number: int, wand_id: int) -> tuple[BoardKey, ...]:
+    return (
+        (template_id, "all", 0),
+        (template_id, "wand", wand_id),
+        (template_id, "device", device_number),
+    )
+
+
+def _rank_key(entry: BoardEntry) -> tuple:
+    # Larger is better: higher score, then earlier finalize (the first to
+    # reach a score keeps it, as for champions), then a stable attempt order.
+    return (
+        entry.score,
+        -entry.finalized_at_ms,
+        -entry.device_number,
+        -entry.wand_id,
+        -entry.attempt_id,
+    )
+
+
+class TopKBoards:
+    """
+    Bounded top-`k` boards held in memory.
+
+    Each board is a min-heap of at most `k` entries, so the weakest entry is
+    at the root: a new attempt costs O(log k) and either replaces the root or
+    is rejected. An attempt appears at most once per board; offering it again
+    replaces its entry. offer() returns what changed so the caller can mirror
+    it into the leaderboard table.
+    """
+
+    def __init__(self, k: int):
+        self.k = max(1, k)
+        self._heaps: dict[BoardKey, list[tuple[tuple, BoardEntry]]] = {}
+        self._members: dict[BoardKey, dict[AttemptKey, BoardEntry]] = {}
+        self._placements: dict[AttemptKey, set[BoardKey]] = {}
+        self._lock = threading.Lock()
+
+    def offer(self, entry: BoardEntry) -> BoardChanges:
+        changes = BoardChanges()
+        keys = board_keys(entry.template_id, entry.device_number, entry.wand_id)
+        with self._lock:
+            # The attempt was re-scored against another template: leave its old boards.
+            for board in list(self._placements.get(entry.attempt_key, ())):
+                if board not in keys:
+                    changes.deletes.append((board, self._remove(board, entry.attempt_key)))
+            for board in keys:
+                self._offer(board, entry, changes)
+        return changes
+
+    def _remove(self, board: BoardKey, key: AttemptKey) -> BoardEntry:
+        old = self._members[board].pop(key)
+        heap = self._heaps[board]
+        heap[:] = [item for item in heap if item[1].attempt_key != key]
+        heapq.heapify(heap)
+        placements = self._placements[key]
+        placements.discard(board)
+        if not placements:
+            del self._placements[key]
+        return old
+
+    def _add(self, board: BoardKey, entry: BoardEntry) -> None:
+        self._members.setdefault(board, {})[entry.attempt_key] = entry
+        self._placements.setdefault(entry.attempt_key, set()).add(board)
+
+    def _offer(self, board: BoardKey, entry: BoardEntry, changes: BoardChanges) -> None:
+        if entry.attempt_key in self._members.get(board, ()):
+            self._remove(board, entry.attempt_key)
+        heap = self._heaps.setdefault(board, [])
+        item = (_rank_key(entry), entry)
+        if len(heap) < self.k:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            _, evicted = heapq.heapreplace(heap, item)
+            del self._members[board][evicted.attempt_key]
+            placements = self._placements[evicted.attempt_key]
+            placements.discard(board)
+            if not placements:
+                del self._placements[evicted.attempt_key]
+            changes.deletes.append((board, evicted))
+        else:
+            return
+        self._add(board, entry)
+        changes.upserts.append((board, entry))
+
+    def checkpoint(self, entries: Iterable[BoardEntry]) -> dict[BoardKey, list]:
+        """Copies of every board that offering `entries` can change, for rollback()."""
+        with self._lock:
+            boards: set[BoardKey] = set()
+            for entry in entries:
+                boards.update(board_keys(entry.template_id, entry.device_number, entry.wand_id))
+                boards.update(self._placements.get(entry.attempt_key, ()))
+            return {board: list(self._heaps.get(board, ())) for board in boards}
+
+    def rollback(self, saved: dict[BoardKey, list]) -> None:
+        """Puts the boards in `saved` back as they were at checkpoint()."""
+        with self._lock:
+            for board, heap in saved.items():
+                for key in self._members.pop(board, {}):
+                    placements = self._placements[key]
+                    placements.discard(board)
+                    if not placements:
+                        del self._placements[key]
+                if not heap:
+                    self._heaps.pop(board, None)
+                    continue
+                self._heaps[board] = list(heap)
+                for _, entry in heap:
+                    self._add(board, entry)
+
+    def entries(self) -> list[tuple[BoardKey, BoardEntry]]:
+        with self._lock:
+            return [
+                (board, entry)
+                for board, members in self._members.items()
+                for entry in members.values()
+            ]
+
+    def page(
+        self,
+        board: BoardKey,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> tuple[int, list[BoardEntry]]:
+        """Total entries on `board` and the slice [offset, offset + limit), best first."""
+        with self._lock:
+            ranked = sorted(self._heaps.get(board, ()), key=lambda item: item[0], reverse=True)
+        return len(ranked), [entry for _, entry in ranked[offset:offset + limit]]
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "top_k": self.k,
+                "boards": len(self._heaps),
+                "entries": sum(len(heap) for heap in self._heaps.values()),
+            }
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+from dataclasses import replace
 from datetime import datetime, timezone
 import logging
 import os
 import shutil
 import sys
+import threading
+import time
 from pathlib import Path
 from typing import Any
 
-from fastapi import Body, HTTPException, Path as ApiPath, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import Body, Header, HTTPException, Path as ApiPath, Query
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 CLOUD_DIR = Path(__file__).resolve().parent
 BRAIN_APP_DIR = CLOUD_DIR / "backend" / "versions" / "brain_v2_scoring"
@@ -43,18 +49,31 @@ if str(BRAIN_SRC_DIR) not in sys.path:
     sys.path.insert(0, str(BRAIN_SRC_DIR))
 
 from database.database import Base, SessionLocal, engine  # noqa: E402
-from database.models import Attempt, TemplateChampion  # noqa: E402
+from database.migrations import migrate  # noqa: E402
+from database.models import Attempt, LeaderboardEntry, TemplateChampion, Watermark  # noqa: E402
 from node_control import NodeControlStore  # noqa: E402
+from attempt_writer import BatchWriter  # noqa: E402
+from payload_cache import PayloadCache  # noqa: E402
+from leaderboards import SCOPES, BoardChanges, BoardEntry, TopKBoards  # noqa: E402
 import brain.api.server as brain_server  # noqa: E402
 from brain.api.server import FinalResult, app, state  # noqa: E402
-from brain.scoring import compute_score, list_templates  # noqa: E402
 
 DB_READY = False
 _DB_WARNING: str | None = None
+# Per-wand targets and per-attempt pins. Points and finalizes for different
+# wands run concurrently under their own shard locks, so both share this lock.
+template_selection_lock = threading.Lock()
 selected_template_by_wand: dict[int, str] = {}
 attempt_template_by_key: dict[tuple[int, int, int], str] = {}
 node_control_store = NodeControlStore(CLOUD_DATA_DIR / "node_control_state.json")
 CHAMPION_SCORE_EPSILON = 1e-9
+# Attempt rows are written by a background thread, up to this many per transaction.
+DB_BATCH_MAX = max(1, int(os.getenv("WB_DB_BATCH_MAX", "256")))
+# How long the writer waits for more attempts before committing a partial batch.
+DB_BATCH_WAIT_MS = max(0, int(os.getenv("WB_DB_BATCH_WAIT_MS", "50")))
+# Entries kept per leaderboard (per template, and per template and wand/device).
+LEADERBOARD_TOP_K = max(1, int(os.getenv("WB_LEADERBOARD_TOP_K", "100")))
+leaderboard_boards = TopKBoards(LEADERBOARD_TOP_K)
 
 
 def initialize_database() -> None:
@@ -63,6 +82,7 @@ def initialize_database() -> None:
         return
     try:
         Base.metadata.create_all(bind=engine)
+        migrate(engine)
         DB_READY = True
         _DB_WARNING = None
         logger.info("Database ready")
@@ -72,36 +92,257 @@ def initialize_database() -> None:
         logger.warning("Database unavailable: %s", exc)
 
 
+CHAMPION_BACKFILL_WATERMARK = "template_champion_backfill"
+LEADERBOARD_BACKFILL_WATERMARK = "leaderboard_backfill"
+
+
+def _scored_attempts_since(db, name: str) -> tuple[Watermark | None, int | None, list]:
+    """
+    Watermark `name`, the latest Attempt.updated_at_ms, and filters selecting
+    scored attempts inserted or rewritten past the watermark (every upsert
+    stamps updated_at_ms). Latest is None when nothing moved; the maximum is
+    answered from an index.
+    """
+    latest = db.execute(select(func.max(Attempt.updated_at_ms))).scalar()
+    mark = db.get(Watermark, name)
+    if latest is None or (mark is not None and mark.updated_at_ms >= latest):
+        return mark, None, []
+
+    scored = [Attempt.best_template_id.isnot(None), Attempt.score.isnot(None)]
+    if mark is not None:
+        scored.append(Attempt.updated_at_ms > mark.updated_at_ms)
+    return mark, latest, scored
+
+
+def _advance_watermark(db, name: str, mark: Watermark | None, latest: int) -> None:
+    if mark is None:
+        mark = Watermark(name=name)
+        db.add(mark)
+    mark.updated_at_ms = latest
+
+
+def _ranked_attempts(db, scored: list, partition_by: list, max_rank: int) -> list[Attempt]:
+    # Best first, as leaderboards._rank_key: highest score, earliest finalize,
+    # then the lowest (device_number, wand_id, attempt_id).
+    ranked = (
+        select(
+            Attempt.id,
+            func.row_number().over(
+                partition_by=partition_by,
+                order_by=(
+                    Attempt.score.desc(),
+                    Attempt.finalized_at_ms.asc(),
+                    Attempt.device_number.asc(),
+                    Attempt.wand_id.asc(),
+                    Attempt.attempt_id.asc(),
+                ),
+            ).label("rank"),
+        )
+        .where(*scored)
+        .subquery()
+    )
+    return (
+        db.query(Attempt)
+        .join(ranked, Attempt.id == ranked.c.id)
+        .filter(ranked.c.rank <= max_rank)
+        .all()
+    )
+
+
 def backfill_template_champions() -> int:
+    """
+    Promotes the best stored attempt of every template, for attempts written
+    without champion promotion (score requests, older builds, imports). One
+    window query picks each template's best attempt (highest score, earliest
+    on ties) among the attempts inserted or rewritten since the last run; a
+    watermark of the latest updated_at_ms seen skips the query entirely when
+    nothing changed. Returns the number of templates whose champion changed.
+    """
     initialize_database()
     if not DB_READY:
         return 0
 
     with SessionLocal() as db:
-        attempts = (
-            db.query(Attempt)
-            .filter(Attempt.best_template_id.isnot(None), Attempt.score.isnot(None))
-            .order_by(Attempt.finalized_at_ms.asc(), Attempt.id.asc())
-            .all()
-        )
-
+        mark, latest, scored = _scored_attempts_since(db, CHAMPION_BACKFILL_WATERMARK)
+        if latest is None:
+            return 0
+        best_rows = _ranked_attempts(db, scored, [Attempt.best_template_id], max_rank=1)
+
+        champions = {
+            row.template_id: row.attempt_id
+            for row in db.query(TemplateChampion).filter(
+                TemplateChampion.template_id.in_({row.best_template_id for row in best_rows})
+            )
+        }
         updated_templates: set[str] = set()
-        for row in attempts:
-            current = db.query(TemplateChampion).filter(TemplateChampion.template_id == row.best_template_id).one_or_none()
-            current_attempt_id = None if current is None else current.attempt_id
+        for row in best_rows:
             champion = _maybe_promote_template_champion(db, row)
-            if champion is not None:
-                db.flush()
-            if champion is not None and champion.attempt_id != current_attempt_id:
+            if champion is not None and champion.attempt_id != champions.get(row.best_template_id):
                 updated_templates.add(champion.template_id)
+            db.flush()
 
-        if updated_templates:
-            db.commit()
-        else:
-            db.rollback()
+        _advance_watermark(db, CHAMPION_BACKFILL_WATERMARK, mark, latest)
+        db.commit()
         return len(updated_templates)
 
 
+def _board_row_key(board: tuple[str, str, int], entry: BoardEntry) -> dict[str, Any]:
+    template_id, scope, scope_id = board
+    return {
+        "template_id": template_id,
+        "scope": scope,
+        "scope_id": scope_id,
+        "device_number": entry.device_number,
+        "wand_id": entry.wand_id,
+        "attempt_id": entry.attempt_id,
+    }
+
+
+def _apply_board_changes(db, changes: BoardChanges) -> None:
+    """Mirrors one TopKBoards.offer() into leaderboard_entries; lookups use the unique index."""
+    for board, entry in changes.deletes:
+        # "fetch" drops the deleted rows from the session too, so a new row
+        # that reuses their primary key doesn't collide in the identity map.
+        db.query(LeaderboardEntry).filter_by(**_board_row_key(board, entry)).delete(
+            synchronize_session="fetch"
+        )
+    for board, entry in changes.upserts:
+        key = _board_row_key(board, entry)
+        row = db.query(LeaderboardEntry).filter_by(**key).one_or_none() or LeaderboardEntry(**key)
+        row.template_name = entry.template_name
+        row.finalized_at_ms = entry.finalized_at_ms
+        row.score = entry.score
+        db.add(row)
+    db.flush()
+
+
+def _board_entry(row: Attempt) -> BoardEntry | None:
+    if not row.best_template_id or row.score is None:
+        return None
+    return BoardEntry(
+        template_id=row.best_template_id,
+        template_name=row.best_template_name or row.best_template_id,
+        device_number=row.device_number,
+        wand_id=row.wand_id,
+        attempt_id=row.attempt_id,
+        score=row.score,
+        finalized_at_ms=row.finalized_at_ms,
+    )
+
+
+def _stored_board_entry(row: LeaderboardEntry) -> BoardEntry:
+    return BoardEntry(
+        template_id=row.template_id,
+        template_name=row.template_name,
+        device_number=row.device_number,
+        wand_id=row.wand_id,
+        attempt_id=row.attempt_id,
+        score=row.score,
+        finalized_at_ms=row.finalized_at_ms,
+    )
+
+
+def _sync_board_rows(db, boards: TopKBoards, rows: list[LeaderboardEntry], chunk: int = 500) -> int:
+    """
+    Makes leaderboard_entries match `boards`, given all its current `rows`:
+    rows no board keeps are deleted in bulk, missing ones are inserted and
+    only changed ones are updated. Returns the rows inserted or updated.
+    """
+    wanted = {(board, entry.attempt_key): entry for board, entry in boards.entries()}
+    stale, written = [], 0
+    for row in rows:
+        board = (row.template_id, row.scope, row.scope_id)
+        entry = wanted.pop((board, (row.device_number, row.wand_id, row.attempt_id)), None)
+        if entry is None:
+            stale.append(row.id)
+        elif (row.template_name, row.finalized_at_ms, row.score) != (
+            entry.template_name, entry.finalized_at_ms, entry.score
+        ):
+            row.template_name = entry.template_name
+            row.finalized_at_ms = entry.finalized_at_ms
+            row.score = entry.score
+            written += 1
+    for i in range(0, len(stale), chunk):
+        db.query(LeaderboardEntry).filter(LeaderboardEntry.id.in_(stale[i:i + chunk])).delete(
+            synchronize_session="fetch"
+        )
+    db.add_all(
+        LeaderboardEntry(
+            **_board_row_key(board, entry),
+            template_name=entry.template_name,
+            finalized_at_ms=entry.finalized_at_ms,
+            score=entry.score,
+        )
+        for (board, _key), entry in wanted.items()
+    )
+    db.flush()
+    return written + len(wanted)
+
+
+def load_leaderboards() -> int:
+    """
+    Rebuilds the in-memory boards from leaderboard_entries (at most top-K rows
+    per board, so this doesn't grow with the attempt history) and swaps them
+    in once the table agrees with them: rows beyond the current
+    WB_LEADERBOARD_TOP_K are deleted, and rows for boards that now have room
+    (it grew) are added. On failure the current boards are left as they are.
+    Returns the entries loaded.
+    """
+    global leaderboard_boards
+    initialize_database()
+    if not DB_READY:
+        return 0
+
+    boards = TopKBoards(LEADERBOARD_TOP_K)
+    with SessionLocal() as db:
+        rows = db.query(LeaderboardEntry).all()
+        for row in rows:
+            boards.offer(_stored_board_entry(row))
+        _sync_board_rows(db, boards, rows)
+        db.commit()
+    leaderboard_boards = boards
+    return boards.snapshot()["entries"]
+
+
+def backfill_leaderboards() -> int:
+    """
+    Offers stored attempts past the leaderboard watermark to the boards: one
+    window query per scope returns at most top-K attempts per board. Skipped
+    when no attempt moved since the last run. Returns the rows written.
+    """
+    initialize_database()
+    if not DB_READY:
+        return 0
+
+    with SessionLocal() as db:
+        mark, latest, scored = _scored_attempts_since(db, LEADERBOARD_BACKFILL_WATERMARK)
+        if latest is None:
+            return 0
+        partitions = {
+            "all": [Attempt.best_template_id],
+            "wand": [Attempt.best_template_id, Attempt.wand_id],
+            "device": [Attempt.best_template_id, Attempt.device_number],
+        }
+        entries = [
+            _board_entry(row)
+            for scope in SCOPES
+            for row in _ranked_attempts(
+                db, scored, partitions[scope], max_rank=leaderboard_boards.k
+            )
+        ]
+        saved = leaderboard_boards.checkpoint(entries)
+        try:
+            for entry in entries:
+                leaderboard_boards.offer(entry)
+            written = _sync_board_rows(db, leaderboard_boards, db.query(LeaderboardEntry).all())
+            _advance_watermark(db, LEADERBOARD_BACKFILL_WATERMARK, mark, latest)
+            db.commit()
+        except Exception:
+            leaderboard_boards.rollback(saved)
+            raise
+        return written
+
+
 @app.on_event("startup")
 def _cloud_startup() -> None:
     initialize_database()
@@ -112,6 +353,21 @@ def _cloud_startup() -> None:
                 logger.info("Template champion backfill updated %s templates", updated)
         except Exception as exc:  # pragma: no cover - keep startup resilient
             logger.warning("Template champion backfill failed: %s", exc)
+        try:
+            load_leaderboards()
+            written = backfill_leaderboards()
+            if written:
+                logger.info("Leaderboard backfill wrote %s entries", written)
+        except Exception as exc:  # pragma: no cover - keep startup resilient
+            logger.warning("Leaderboard backfill failed: %s", exc)
+    # Started last so the boards are loaded before queued attempts reach them.
+    attempt_writer.start()
+
+
+@app.on_event("shutdown")
+def _cloud_shutdown() -> None:
+    # Registered after the Brain's own shutdown, so ingest has stopped by now.
+    attempt_writer.stop()
 
 
 @app.get("/")
@@ -176,7 +432,7 @@ def _normalize_player_name(value: Any) -> str:
 
 
 def _template_refs() -> dict[str, Any]:
-    return {template.template_id: template for template in list_templates(brain_server.TEMPLATES_DIR)}
+    return {template.template_id: template for template in brain_server.template_bank.refs()}
 
 
 def _default_template_id() -> str | None:
@@ -229,6 +485,7 @@ def _maybe_promote_template_champion(db, row: Attempt) -> TemplateChampion | Non
         champion.finalized_at_ms = row.finalized_at_ms
         champion.score = row.score
         db.add(champion)
+        db.info["leaderboard_changed"] = True
         return champion
 
     if champion is not None and row.score <= (champion.score + CHAMPION_SCORE_EPSILON):
@@ -246,90 +503,188 @@ def _maybe_promote_template_champion(db, row: Attempt) -> TemplateChampion | Non
     champion.player_name = None
     champion.claimed_at = None
     db.add(champion)
+    db.info["leaderboard_changed"] = True
     return champion
 
 
-def upsert_attempt_record(res: FinalResult, *, promote_champion: bool = False) -> Attempt | None:
-    initialize_database()
-    if not DB_READY:
-        return None
+ATTEMPT_KEY_COLUMNS = ("device_number", "wand_id", "attempt_id")
+ATTEMPT_RESULT_COLUMNS = (
+    "start_ms",
+    "end_ms",
+    "finalized_at_ms",
+    "num_points",
+    "render_path",
+    "status",
+    "best_template_id",
+    "best_template_name",
+    "score",
+    "updated_at_ms",
+)
+# Dialects with INSERT ... ON CONFLICT DO UPDATE.
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def _attempt_values(res: FinalResult) -> dict[str, Any]:
+    return {
+        "device_number": res.device_number,
+        "wand_id": res.wand_id,
+        "attempt_id": res.attempt_id,
+        "start_ms": res.start_ms,
+        "end_ms": res.end_ms,
+        "finalized_at_ms": res.finalized_at_ms,
+        "num_points": res.num_points,
+        "render_path": str(Path(res.render_path).resolve()),
+        "status": res.status,
+        "best_template_id": res.best_template_id,
+        "best_template_name": res.best_template_name,
+        "score": res.score,
+        "updated_at_ms": int(time.time() * 1000),
+    }
 
-    with SessionLocal() as db:
-        row = (
-            db.query(Attempt)
-            .filter(
-                Attempt.device_number == res.device_number,
-                Attempt.wand_id == res.wand_id,
-                Attempt.attempt_id == res.attempt_id,
-            )
-            .one_or_none()
-        )
+
+def _upsert_attempts_fallback(db, values: list[dict[str, Any]]) -> None:
+    # Select-then-write path for databases without ON CONFLICT.
+    attempt_ids = {v["attempt_id"] for v in values}
+    existing = {
+        tuple(getattr(row, c) for c in ATTEMPT_KEY_COLUMNS): row
+        for row in db.query(Attempt).filter(Attempt.attempt_id.in_(attempt_ids))
+    }
+    for v in values:
+        row = existing.get(tuple(v[c] for c in ATTEMPT_KEY_COLUMNS))
         if row is None:
-            row = Attempt(
-                wand_id=res.wand_id,
-                attempt_id=res.attempt_id,
-                device_number=res.device_number,
-                start_ms=res.start_ms,
-                end_ms=res.end_ms,
-                finalized_at_ms=res.finalized_at_ms,
-                num_points=res.num_points,
-                render_path=str(Path(res.render_path).resolve()),
-                status=res.status,
-                best_template_id=res.best_template_id,
-                best_template_name=res.best_template_name,
-                score=res.score,
-            )
+            db.add(Attempt(**v))
         else:
-            row.start_ms = res.start_ms
-            row.end_ms = res.end_ms
-            row.finalized_at_ms = res.finalized_at_ms
-            row.num_points = res.num_points
-            row.render_path = str(Path(res.render_path).resolve())
-            row.status = res.status
-            row.best_template_id = res.best_template_id
-            row.best_template_name = res.best_template_name
-            row.score = res.score
+            for c in ATTEMPT_RESULT_COLUMNS:
+                setattr(row, c, v[c])
+
+
+def upsert_attempts(db, values: list[dict[str, Any]]) -> None:
+    """
+    Inserts or updates attempt rows keyed by (device_number, wand_id,
+    attempt_id). On SQLite and PostgreSQL this is a single
+    INSERT ... ON CONFLICT DO UPDATE against the unique index, so the
+    cost doesn't depend on the table size. Keys must be unique in `values`.
+    """
+    if not values:
+        return
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        _upsert_attempts_fallback(db, values)
+        return
+    stmt = insert(Attempt)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ATTEMPT_KEY_COLUMNS),
+        set_={c: stmt.excluded[c] for c in ATTEMPT_RESULT_COLUMNS},
+    )
+    db.execute(stmt, values)
+
+
+def write_attempt_batch(items: list[tuple[FinalResult, FinalResult | None]]) -> None:
+    """
+    Upserts (row, champion) pairs in one transaction: `row` is the attempt as
+    it should be stored, `champion` the result to promote it with, if any.
+    Champion promotion runs in queue order and is flushed per item, so two
+    attempts for the same template in one batch compare against each other
+    correctly. Every stored row is then offered to the leaderboards.
+    """
+    initialize_database()
+    if not DB_READY:
+        return
+
+    values = [_attempt_values(res) for res, _ in items]
+    # Detached rows: promotion and the boards only read their fields.
+    promoted = [
+        Attempt(**_attempt_values(champion)) for _, champion in items if champion is not None
+    ]
+    # The boards rank attempts as stored, rescores included, which is what
+    # backfill_leaderboards() reads back after a restart.
+    entries = [entry for entry in (_board_entry(Attempt(**v)) for v in values) if entry is not None]
+    saved = leaderboard_boards.checkpoint(entries)
+    try:
+        with SessionLocal() as db:
+            upsert_attempts(db, values)
+            for row in promoted:
+                _maybe_promote_template_champion(db, row)
+                db.flush()
+            for entry in entries:
+                _apply_board_changes(db, leaderboard_boards.offer(entry))
+            db.commit()
+    except Exception:
+        # The table rolled back with the transaction; undo this batch's offers.
+        leaderboard_boards.rollback(saved)
+        raise
 
-        db.add(row)
-        if promote_champion:
-            _maybe_promote_template_champion(db, row)
-        db.commit()
-        db.refresh(row)
-        return row
+
+def _merge_attempt_writes(
+    old: tuple[FinalResult, FinalResult | None],
+    new: tuple[FinalResult, FinalResult | None],
+) -> tuple[FinalResult, FinalResult | None]:
+    # The newest snapshot is stored, but a pending promotion keeps its own
+    # result: a later bank-wide rescore must not promote under another template.
+    return new[0], old[1] if new[1] is None else new[1]
+
+
+attempt_writer = BatchWriter(
+    write_batch=write_attempt_batch,
+    key=lambda item: (item[0].device_number, item[0].wand_id, item[0].attempt_id),
+    merge=_merge_attempt_writes,
+    max_batch=DB_BATCH_MAX,
+    max_wait_ms=DB_BATCH_WAIT_MS,
+)
+
+
+def queue_attempt_write(res: FinalResult, *, promote_champion: bool = False) -> None:
+    """Hands a copy of `res` to the background writer; never touches the database."""
+    snapshot = replace(res, raster=None, cloud=None, mask=None)
+    attempt_writer.put((snapshot, snapshot if promote_champion else None))
 
 
 _original_finalize_locked = state._finalize_locked
 _original_add_point_locked = state._add_point_locked
 
 
+def _pin_attempt_template(key: tuple[int, int, int]) -> str | None:
+    with template_selection_lock:
+        pinned = attempt_template_by_key.get(key)
+        chosen = selected_template_by_wand.get(key[1])
+    if pinned is not None:
+        return pinned
+    chosen = chosen or _default_template_id()
+    if chosen is None:
+        return None
+    with template_selection_lock:
+        return attempt_template_by_key.setdefault(key, chosen)
+
+
 def _tracking_add_point_locked(ev, attempt_id: int, arrival_ms: int):
     _original_add_point_locked(ev, attempt_id=attempt_id, arrival_ms=arrival_ms)
-    key = (ev.device_number, ev.wand_id, attempt_id)
-    if key not in attempt_template_by_key:
-        chosen = selected_template_by_wand.get(ev.wand_id) or _default_template_id()
-        if chosen is not None:
-            attempt_template_by_key[key] = chosen
+    _pin_attempt_template((ev.device_number, ev.wand_id, attempt_id))
+
+
+def _live_template_for(device_number: int, wand_id: int, attempt_id: int) -> str | None:
+    # Called for the attempt's first point; live-score against the template it is pinned to.
+    return _pin_attempt_template((device_number, wand_id, attempt_id))
 
 
 state._add_point_locked = _tracking_add_point_locked  # type: ignore[assignment]
+state.live_template_for = _live_template_for  # type: ignore[assignment]
 
 
 def _persisting_finalize_locked(device: int, wand: int, attempt_id: int, close_reason: str):
     res = _original_finalize_locked(device, wand, attempt_id, close_reason)
     if res is not None:
         key = (device, wand, attempt_id)
-        template_id = attempt_template_by_key.pop(key, None)
+        with template_selection_lock:
+            template_id = attempt_template_by_key.pop(key, None)
         if template_id:
-            template_path = brain_server.TEMPLATES_DIR / f"{template_id}.png"
-            if template_path.exists():
-                score_result = compute_score(Path(res.render_path), template_path)
+            template = brain_server.template_bank.get(template_id)
+            if template is not None:
+                # Score the raster finalize just drew; never re-read render_path here.
+                score_result = brain_server.template_bank.score_image(res.raster, template)
                 res.best_template_id = score_result.template_id
                 res.best_template_name = score_result.template_name
                 res.score = score_result.score
-        try:
-            upsert_attempt_record(res, promote_champion=True)
-        except Exception as exc:  # pragma: no cover - keep live path resilient
-            logger.warning("Failed to persist attempt %s/%s/%s: %s", device, wand, attempt_id, exc)
+        queue_attempt_write(res, promote_champion=True)
     return res
 
 
@@ -338,12 +693,18 @@ state._finalize_locked = _persisting_finalize_locked  # type: ignore[assignment]
 _original_score_attempt_payload = brain_server._score_attempt_payload
 
 
-def _persisting_score_attempt_payload(res: FinalResult, template_id: str | None):
-    payload = _original_score_attempt_payload(res, template_id)
-    try:
-        upsert_attempt_record(res, promote_champion=False)
-    except Exception as exc:  # pragma: no cover - keep scoring endpoint alive
-        logger.warning("Failed to persist scored attempt %s: %s", res.attempt_id, exc)
+def _persisting_score_attempt_payload(
+    res: FinalResult,
+    template_id: str | None,
+    top_k: int | None = None,
+    method: str | None = None,
+):
+    before = (res.best_template_id, res.best_template_name, res.score)
+    payload = _original_score_attempt_payload(res, template_id, top_k, method)
+    # Polls mostly hit the score cache; only write when the best result moved.
+    if (res.best_template_id, res.best_template_name, res.score) == before:
+        return payload
+    queue_attempt_write(res, promote_champion=False)
     return payload
 
 
@@ -352,11 +713,14 @@ brain_server._score_attempt_payload = _persisting_score_attempt_payload
 
 @app.get("/api/v2/wand/{wand_id}/target-template")
 def api_wand_target_template(wand_id: int = ApiPath(..., ge=1)) -> dict[str, Any]:
-    template_id = selected_template_by_wand.get(wand_id) or _default_template_id()
+    with template_selection_lock:
+        template_id = selected_template_by_wand.get(wand_id)
     if template_id is None:
-        raise HTTPException(status_code=400, detail="no templates available")
-    if wand_id not in selected_template_by_wand:
-        selected_template_by_wand[wand_id] = template_id
+        default = _default_template_id()
+        if default is None:
+            raise HTTPException(status_code=400, detail="no templates available")
+        with template_selection_lock:
+            template_id = selected_template_by_wand.setdefault(wand_id, default)
     return _json_no_store(_template_payload(wand_id, template_id, applies_to="next_attempt"))
 
 
@@ -369,17 +733,22 @@ def api_set_wand_target_template(
     if template_id not in refs:
         raise HTTPException(status_code=404, detail="template not found")
 
-    selected_template_by_wand[wand_id] = template_id
     active_attempt_key = None
-    with state.lock:
-        ws = state.wand_status.get(wand_id)
-        if ws and ws.active and ws.current_attempt_id is not None and ws.device_number is not None:
-            active_attempt_key = (ws.device_number, wand_id, ws.current_attempt_id)
+    ws = state.wand_payload(wand_id)
+    if (
+        ws
+        and ws["active"]
+        and ws["current_attempt_id"] is not None
+        and ws["device_number"] is not None
+    ):
+        active_attempt_key = (ws["device_number"], wand_id, ws["current_attempt_id"])
 
     applies_to = "next_attempt"
-    if active_attempt_key is not None and active_attempt_key not in attempt_template_by_key:
-        attempt_template_by_key[active_attempt_key] = template_id
-        applies_to = "current_attempt"
+    with template_selection_lock:
+        selected_template_by_wand[wand_id] = template_id
+        if active_attempt_key is not None and active_attempt_key not in attempt_template_by_key:
+            attempt_template_by_key[active_attempt_key] = template_id
+            applies_to = "current_attempt"
 
     return _json_no_store(_template_payload(wand_id, template_id, applies_to=applies_to))
 
@@ -437,13 +806,8 @@ def api_post_node_ack(
     )
 
 
-@app.get("/api/v3/leaderboards")
-def api_v3_leaderboards() -> dict[str, Any]:
-    initialize_database()
-    if not DB_READY:
-        raise HTTPException(status_code=503, detail=_DB_WARNING or "database unavailable")
-
-    templates = list_templates(brain_server.TEMPLATES_DIR)
+def _build_leaderboards() -> dict[str, Any]:
+    templates = brain_server.template_bank.refs()
     with SessionLocal() as db:
         champions = db.query(TemplateChampion).all()
 
@@ -452,7 +816,11 @@ def api_v3_leaderboards() -> dict[str, Any]:
         {
             "template_id": template.template_id,
             "template_name": template.name,
-            "champion": None if champion_by_template.get(template.template_id) is None else _champion_payload(champion_by_template[template.template_id]),
+            "champion": (
+                None
+                if champion_by_template.get(template.template_id) is None
+                else _champion_payload(champion_by_template[template.template_id])
+            ),
         }
         for template in templates
     ]
@@ -462,6 +830,90 @@ def api_v3_leaderboards() -> dict[str, Any]:
     }
 
 
+# Serialized /api/v3/leaderboards body; invalidated after any commit that
+# changes a TemplateChampion row, and rebuilt when the template set changes.
+leaderboard_cache = PayloadCache(_build_leaderboards)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_leaderboards_after_commit(session) -> None:
+    if session.info.pop("leaderboard_changed", False):
+        leaderboard_cache.invalidate()
+
+
+@app.get("/api/v3/leaderboards")
+def api_v3_leaderboards(if_none_match: str | None = Header(default=None)) -> Response:
+    initialize_database()
+    if not DB_READY:
+        raise HTTPException(status_code=503, detail=_DB_WARNING or "database unavailable")
+
+    brain_server.template_bank.refresh()
+    cached = leaderboard_cache.get(key=brain_server.template_bank.version)
+    headers = {
+        "ETag": cached.etag,
+        # Clients may keep a copy but must revalidate it (If-None-Match) every time.
+        "Cache-Control": "no-cache, must-revalidate, max-age=0",
+        "Pragma": "no-cache",
+        "Expires": "0",
+    }
+    if if_none_match and cached.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.data, media_type="application/json", headers=headers)
+
+
+def _board_entry_payload(rank: int, entry: BoardEntry) -> dict[str, Any]:
+    return {
+        "rank": rank,
+        "attempt_id": entry.attempt_id,
+        "wand_id": entry.wand_id,
+        "device_number": entry.device_number,
+        "finalized_at_ms": entry.finalized_at_ms,
+        "score": entry.score,
+        "image_png": f"/api/v1/attempt/{entry.attempt_id}/image.png",
+    }
+
+
+@app.get("/api/v3/leaderboards/{template_id}")
+def api_v3_template_leaderboard(
+    template_id: str = ApiPath(...),
+    scope: str = Query("all"),
+    scope_id: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+) -> dict[str, Any]:
+    initialize_database()
+    if not DB_READY:
+        raise HTTPException(status_code=503, detail=_DB_WARNING or "database unavailable")
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(SCOPES)}")
+    if scope == "all":
+        scope_id = 0
+    elif scope_id < 1:
+        raise HTTPException(
+            status_code=400,
+            detail=f"scope_id ({scope} number) is required for scope={scope}",
+        )
+
+    template = brain_server.template_bank.get(template_id)
+    if template is None:
+        raise HTTPException(status_code=404, detail="template not found")
+
+    total, entries = leaderboard_boards.page(
+        (template_id, scope, scope_id), offset=offset, limit=limit
+    )
+    return {
+        "template_id": template.template_id,
+        "template_name": template.ref.name,
+        "scope": scope,
+        "scope_id": scope_id,
+        "top_k": leaderboard_boards.k,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "entries": [_board_entry_payload(offset + i + 1, entry) for i, entry in enumerate(entries)],
+    }
+
+
 @app.post("/api/v3/leaderboards/claim")
 def api_v3_leaderboards_claim(payload: dict[str, Any] | None = Body(default=None)) -> dict[str, Any]:
     initialize_database()
@@ -482,6 +934,8 @@ def api_v3_leaderboards_claim(payload: dict[str, Any] | None = Body(default=None
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+    # The attempt may have been finalized a moment ago; make sure its row is in.
+    attempt_writer.flush()
     with SessionLocal() as db:
         champion = db.query(TemplateChampion).filter(TemplateChampion.attempt_id == attempt_id).one_or_none()
         if champion is None:
@@ -490,6 +944,7 @@ def api_v3_leaderboards_claim(payload: dict[str, Any] | None = Body(default=None
         champion.player_name = player_name
         champion.claimed_at = datetime.now(timezone.utc)
         db.add(champion)
+        db.info["leaderboard_changed"] = True
         db.commit()
         db.refresh(champion)
         return {
@@ -504,6 +959,9 @@ def api_database_health() -> dict[str, Any]:
     return {
         "ok": DB_READY,
         "warning": _DB_WARNING,
+        "writer": attempt_writer.snapshot(),
+        "leaderboard_cache": leaderboard_cache.snapshot(),
+        "leaderboards": leaderboard_boards.snapshot(),
     }
 
 
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    data: bytes
+    etag: str  # strong validator, quoted as sent on the wire
+    key: Hashable
+    generation: int
+
+
+def encode_json(payload: Any) -> tuple[bytes, str]:
+    # Same encoding as FastAPI's JSONResponse.
+    data = json.dumps(
+        payload,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return data, f'"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+
+class PayloadCache:
+    """
+    One JSON payload, kept serialized until invalidate() is called or the
+    caller's `key` changes.
+
+    `build()` runs outside the lock. The generation is read before building,
+    so an invalidate() that lands while a build is in flight (e.g. a commit
+    racing a poll) makes the next get() rebuild instead of serving the older
+    payload. Callers must invalidate after their change is visible to build().
+    """
+
+    def __init__(self, build: Callable[[], Any]):
+        self.build = build
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._cached: CachedPayload | None = None
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+
+    def get(self, key: Hashable = None) -> CachedPayload:
+        with self._lock:
+            cached = self._cached
+            if cached is not None and cached.generation == self._generation and cached.key == key:
+                self.hits += 1
+                return cached
+            generation = self._generation
+
+        data, etag = encode_json(self.build())
+        fresh = CachedPayload(data=data, etag=etag, key=key, generation=generation)
+        with self._lock:
+            self.builds += 1
+            if self._cached is None or self._cached.generation <= generation:
+                self._cached = fresh
+        return fresh
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "builds": self.builds,
+                "invalidations": self.invalidations,
+                "generation": self._generation,
+                "bytes": 0 if self._cached is None else len(self._cached.data),
+            }
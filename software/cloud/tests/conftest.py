@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# main binds its engine on import; point it at a throwaway database first.
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='wand-cloud-tests-')}/cloud.sqlite3"
+
+import pytest
+
+
+@pytest.fixture
+def cloud(monkeypatch):
+    """The cloud app with empty tables, fresh leaderboards and no cached payloads."""
+    import main
+
+    main.initialize_database()
+    with main.SessionLocal() as db:
+        for table in reversed(main.Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+    monkeypatch.setattr(main, "leaderboard_boards", main.TopKBoards(main.LEADERBOARD_TOP_K))
+    main.leaderboard_cache.invalidate()
+    return main
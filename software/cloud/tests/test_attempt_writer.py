@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from attempt_writer import BatchWriter
+
+
+def _writer(batches: list, **kwargs) -> BatchWriter:
+    return BatchWriter(write_batch=batches.append, key=lambda item: item[0], **kwargs)
+
+
+def test_items_with_the_same_key_are_coalesced() -> None:
+    batches = []
+    writer = _writer(batches, merge=lambda old, new: (new[0], old[1] + new[1]))
+    for item in [("a", 1), ("b", 10), ("a", 2), ("a", 3)]:
+        writer.put(item)
+
+    assert writer.depth() == 2
+    writer.start()
+    assert writer.flush()
+    writer.stop()
+
+    # First-enqueue order is kept; "a" is the merge of all three puts.
+    assert batches == [[("a", 6), ("b", 10)]]
+    stats = writer.snapshot()
+    counts = (stats["enqueued"], stats["coalesced"], stats["written"], stats["batches"])
+    assert counts == (4, 2, 2, 1)
+
+
+def test_flush_waits_for_the_writer_and_stop_drains_the_queue() -> None:
+    batches = []
+    release = threading.Event()
+
+    def slow_write(batch):
+        release.wait(timeout=5.0)
+        batches.append(batch)
+
+    writer = BatchWriter(write_batch=slow_write, key=lambda item: item, max_batch=2, max_wait_ms=0)
+    # Nothing is written without a running thread.
+    writer.put(0)
+    assert writer.flush(timeout=0.05) is False
+
+    writer.start()
+    for item in range(1, 5):
+        writer.put(item)
+    assert writer.flush(timeout=0.1) is False
+    release.set()
+    assert writer.flush(timeout=5.0)
+    assert sorted(item for batch in batches for item in batch) == [0, 1, 2, 3, 4]
+    assert max(len(batch) for batch in batches) <= 2
+
+    # Items queued before stop() are still written.
+    for item in range(5, 9):
+        writer.put(item)
+    writer.stop()
+    assert sorted(item for batch in batches for item in batch) == list(range(9))
+    assert writer.snapshot()["running"] is False
+    assert writer.depth() == 0
+
+
+def test_lag_stats_measure_time_spent_queued() -> None:
+    batches = []
+    writer = _writer(batches, max_wait_ms=0)
+    writer.put(("a", 1))
+    time.sleep(0.06)
+
+    assert writer.snapshot()["lag_ms"] >= 50
+    writer.start()
+    assert writer.flush()
+    writer.stop()
+
+    stats = writer.snapshot()
+    assert stats["lag_ms"] == 0
+    assert stats["last_batch_lag_ms"] >= 50
+    assert stats["max_batch_lag_ms"] >= stats["last_batch_lag_ms"]
+    assert stats["last_commit_ms"] is not None
+
+
+def test_failed_batch_is_retried_item_by_item() -> None:
+    written = []
+
+    def write(batch):
+        if any(item == "bad" for item in batch):
+            raise ValueError("bad row")
+        written.extend(batch)
+
+    writer = BatchWriter(write_batch=write, key=lambda item: item, max_wait_ms=0)
+    for item in ["ok1", "bad", "ok2"]:
+        writer.put(item)
+    writer.start()
+    writer.flush()
+    writer.stop()
+
+    assert written == ["ok1", "ok2"]
+    assert (writer.snapshot()["written"], writer.snapshot()["failed"]) == (2, 1)
+
+
+def test_rescore_queued_after_a_finalize_keeps_its_promotion(cloud, monkeypatch) -> None:
+    def result(template_id: str, score: float):
+        return cloud.FinalResult(
+            1, 1, 7, 7, 10, 0, 1, 1007, "attempt.png",
+            "explicit_end", "processed", template_id, template_id, score,
+        )
+
+    writer = BatchWriter(
+        write_batch=cloud.write_attempt_batch,
+        key=lambda item: (item[0].device_number, item[0].wand_id, item[0].attempt_id),
+        merge=cloud._merge_attempt_writes,
+    )
+    monkeypatch.setattr(cloud, "attempt_writer", writer)
+    cloud.queue_attempt_write(result("circle_v1", 40.0), promote_champion=True)
+    cloud.queue_attempt_write(result("heart_v1", 70.0), promote_champion=False)
+    assert writer.depth() == 1
+
+    writer.start()
+    assert writer.flush()
+    writer.stop()
+
+    with cloud.SessionLocal() as db:
+        row = db.query(cloud.Attempt).one()
+        champions = {
+            c.template_id: (c.attempt_id, c.score) for c in db.query(cloud.TemplateChampion)
+        }
+    assert (row.best_template_id, row.score) == ("heart_v1", 70.0)
+    assert champions == {"circle_v1": (7, 40.0)}
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from leaderboards import TopKBoards, _rank_key
+
+
+def _store(
+    cloud,
+    attempt_id: int,
+    template_id: str,
+    score: float,
+    updated_at_ms: int,
+    wand_id: int = 1,
+):
+    """Upserts an attempt row directly, bypassing the boards as an older build or import would."""
+    res = cloud.FinalResult(
+        1, wand_id, attempt_id, attempt_id, 10, 0, 1, 1000, "attempt.png",
+        "explicit_end", "processed", template_id, template_id, score,
+    )
+    values = cloud._attempt_values(res)
+    values["updated_at_ms"] = updated_at_ms
+    with cloud.SessionLocal() as db:
+        cloud.upsert_attempts(db, [values])
+        db.commit()
+
+
+def _on_boards(cloud) -> set:
+    return {(entry.attempt_id, board[0]) for board, entry in cloud.leaderboard_boards.entries()}
+
+
+def test_backfill_only_offers_rows_past_the_watermark(cloud, monkeypatch) -> None:
+    _store(cloud, 1, "heart_v1", 50.0, updated_at_ms=100)
+    _store(cloud, 2, "heart_v1", 60.0, updated_at_ms=200)
+    assert cloud.backfill_leaderboards() == 6
+    assert _on_boards(cloud) == {(1, "heart_v1"), (2, "heart_v1")}
+
+    # Empty boards show which rows the next runs offer.
+    monkeypatch.setattr(cloud, "leaderboard_boards", TopKBoards(cloud.LEADERBOARD_TOP_K))
+    _store(cloud, 3, "heart_v1", 70.0, updated_at_ms=300)
+    cloud.backfill_leaderboards()
+    assert _on_boards(cloud) == {(3, "heart_v1")}
+
+    # A rescore rewrites attempt 1 in place; the upsert bumps its updated_at_ms.
+    _store(cloud, 1, "star_v1", 80.0, updated_at_ms=400)
+    cloud.backfill_leaderboards()
+    assert _on_boards(cloud) == {(3, "heart_v1"), (1, "star_v1")}
+
+    assert cloud.backfill_leaderboards() == 0
+    with cloud.SessionLocal() as db:
+        assert db.get(cloud.Watermark, cloud.LEADERBOARD_BACKFILL_WATERMARK).updated_at_ms == 400
+
+
+def test_window_query_breaks_ties_like_the_boards(cloud, monkeypatch) -> None:
+    monkeypatch.setattr(cloud, "leaderboard_boards", TopKBoards(1))
+    # Same score and finalize time; the later row ids belong to the lower attempt keys.
+    for updated, (attempt_id, wand_id) in enumerate([(9, 2), (9, 1), (4, 2), (4, 1)], start=1):
+        _store(cloud, attempt_id, "heart_v1", 50.0, updated_at_ms=updated, wand_id=wand_id)
+
+    cloud.backfill_leaderboards()
+
+    with cloud.SessionLocal() as db:
+        tied = [cloud._board_entry(row) for row in db.query(cloud.Attempt)]
+    best = max(tied, key=_rank_key)
+    assert best.attempt_key == (1, 1, 4)
+    _, top = cloud.leaderboard_boards.page(("heart_v1", "all", 0))
+    assert top == [best]
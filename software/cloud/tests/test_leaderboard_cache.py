@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+
+def test_leaderboards_revalidate_with_etag_until_a_write_commits(cloud) -> None:
+    client = TestClient(cloud.app)
+
+    first = client.get("/api/v3/leaderboards")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = client.get("/api/v3/leaderboards", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    # A promoted attempt changes a TemplateChampion row; the commit invalidates the payload.
+    res = cloud.FinalResult(
+        1, 1, 11, 11, 10, 0, 1, 1011, "attempt.png",
+        "explicit_end", "processed", "heart_v1", "Heart V1", 42.0,
+    )
+    cloud.write_attempt_batch([(res, res)])
+
+    changed = client.get("/api/v3/leaderboards", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    heart = next(row for row in changed.json()["leaderboards"] if row["template_id"] == "heart_v1")
+    assert heart["champion"]["attempt_id"] == 11
+
+    # A write that changes no champion keeps the payload.
+    builds = cloud.leaderboard_cache.snapshot()["builds"]
+    cloud.write_attempt_batch([(res, None)])
+    same = client.get("/api/v3/leaderboards", headers={"If-None-Match": changed.headers["etag"]})
+    assert same.status_code == 304
+    assert cloud.leaderboard_cache.snapshot()["builds"] == builds
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import pytest
+
+from leaderboards import TopKBoards
+
+
+def _result(cloud, attempt_id: int, template_id: str, score: float, wand_id: int = 1):
+    return cloud.FinalResult(
+        1, wand_id, attempt_id, attempt_id, 10, 0, 1, 1000 + attempt_id, "attempt.png",
+        "explicit_end", "processed", template_id, template_id, score,
+    )
+
+
+def _boards(cloud) -> list:
+    return sorted(
+        (board, entry.attempt_key, entry.score)
+        for board, entry in cloud.leaderboard_boards.entries()
+    )
+
+
+def _board_rows(cloud) -> list:
+    with cloud.SessionLocal() as db:
+        return sorted(
+            (
+                (row.template_id, row.scope, row.scope_id),
+                (row.device_number, row.wand_id, row.attempt_id),
+                row.score,
+            )
+            for row in db.query(cloud.LeaderboardEntry)
+        )
+
+
+def test_boards_are_the_same_after_a_restart(cloud) -> None:
+    finalized = _result(cloud, 1, "circle_v1", 40.0)
+    cloud.write_attempt_batch([(finalized, finalized)])
+    # A bank-wide rescore stores another template; it is not promoted.
+    cloud.write_attempt_batch([(_result(cloud, 1, "heart_v1", 70.0), None)])
+    for attempt_id, template_id, score, wand_id in [
+        (2, "circle_v1", 55.0, 2),
+        (3, "heart_v1", 30.0, 1),
+    ]:
+        res = _result(cloud, attempt_id, template_id, score, wand_id)
+        cloud.write_attempt_batch([(res, res)])
+
+    runtime = _boards(cloud)
+    assert ((("heart_v1", "all", 0), (1, 1, 1), 70.0)) in runtime
+    assert not [key for board, key, _ in runtime if board[0] == "circle_v1" and key == (1, 1, 1)]
+    assert _board_rows(cloud) == runtime
+
+    cloud.load_leaderboards()
+    cloud.backfill_leaderboards()
+
+    assert _boards(cloud) == runtime
+    assert _board_rows(cloud) == runtime
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_board_rows_are_replaced_without_identity_map_collisions(cloud, monkeypatch) -> None:
+    monkeypatch.setattr(cloud, "leaderboard_boards", TopKBoards(1))
+    for attempt_id in range(10, 16):
+        res = _result(cloud, attempt_id, "star_v1", float(attempt_id), wand_id=attempt_id % 3 + 1)
+        cloud.write_attempt_batch([(res, res)])
+
+    # Replacing the newest rows lets SQLite hand their ids to the inserts.
+    monkeypatch.setattr(cloud, "LEADERBOARD_TOP_K", 3)
+    cloud.load_leaderboards()
+    with cloud.SessionLocal() as db:
+        db.query(cloud.Watermark).delete()
+        db.commit()
+    cloud.backfill_leaderboards()
+
+    assert _board_rows(cloud) == _boards(cloud)
+    assert len([key for board, key, _ in _boards(cloud) if board == ("star_v1", "all", 0)]) == 3
+
+
+def test_failed_batch_rolls_back_its_offers(cloud, monkeypatch) -> None:
+    kept = _result(cloud, 1, "heart_v1", 50.0)
+    cloud.write_attempt_batch([(kept, kept)])
+    before = _boards(cloud)
+
+    applied = []
+    apply_board_changes = cloud._apply_board_changes
+
+    def fail_on_second_offer(db, changes):
+        apply_board_changes(db, changes)
+        applied.append(changes)
+        if len(applied) == 2:
+            raise RuntimeError("database went away")
+
+    monkeypatch.setattr(cloud, "_apply_board_changes", fail_on_second_offer)
+    better = _result(cloud, 2, "heart_v1", 90.0, wand_id=2)
+    with pytest.raises(RuntimeError):
+        cloud.write_attempt_batch([(better, better), (_result(cloud, 1, "star_v1", 10.0), None)])
+
+    assert _boards(cloud) == before
+    assert cloud.leaderboard_boards.snapshot()["boards"] == 3
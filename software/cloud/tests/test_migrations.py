@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from database.migrations import migrate
+
+# The attempts table as create_all() built it before updated_at_ms and the
+# attempt indexes existed.
+OLD_ATTEMPTS = """
+CREATE TABLE attempts (
+    id INTEGER NOT NULL PRIMARY KEY,
+    wand_id INTEGER NOT NULL,
+    attempt_id INTEGER NOT NULL,
+    device_number INTEGER NOT NULL,
+    start_ms BIGINT NOT NULL,
+    end_ms BIGINT NOT NULL,
+    finalized_at_ms BIGINT NOT NULL,
+    num_points INTEGER NOT NULL,
+    render_path TEXT NOT NULL,
+    status VARCHAR,
+    best_template_id VARCHAR,
+    best_template_name VARCHAR,
+    score FLOAT,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+)
+"""
+
+
+def _old_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_ATTEMPTS))
+        conn.execute(text("CREATE INDEX ix_attempts_id ON attempts (id)"))
+        conn.execute(text("CREATE INDEX ix_attempts_wand_id ON attempts (wand_id)"))
+        # (device, wand, attempt) = (1, 1, 5) was written twice by an older build.
+        for device, wand, attempt, finalized, score in [
+            (1, 1, 5, 100, 10.0),
+            (1, 1, 5, 200, 20.0),
+            (1, 1, 6, 150, 30.0),
+            (1, 2, 5, 120, 40.0),
+        ]:
+            conn.execute(
+                text(
+                    "INSERT INTO attempts (wand_id, attempt_id, device_number, start_ms, end_ms,"
+                    " finalized_at_ms, num_points, render_path, status, best_template_id,"
+                    " best_template_name, score)"
+                    " VALUES (:wand, :attempt, :device, 0, 1, :finalized, 10, 'a.png', 'processed',"
+                    " 'heart_v1', 'Heart V1', :score)"
+                ),
+                {
+                    "device": device,
+                    "wand": wand,
+                    "attempt": attempt,
+                    "finalized": finalized,
+                    "score": score,
+                },
+            )
+    return engine
+
+
+def _rows(engine) -> list[tuple]:
+    with engine.connect() as conn:
+        return conn.execute(
+            text(
+                "SELECT device_number, wand_id, attempt_id, finalized_at_ms, score, updated_at_ms"
+                " FROM attempts ORDER BY device_number, wand_id, attempt_id"
+            )
+        ).all()
+
+
+def test_migrate_dedupes_and_is_idempotent(tmp_path) -> None:
+    engine = _old_database(tmp_path)
+
+    created = migrate(engine)
+
+    assert created == [
+        "ix_attempts_finalized_at_ms",
+        "ix_attempts_updated_at_ms",
+        "uq_attempts_device_wand_attempt",
+    ]
+    # The newest duplicate survives; old rows count as written when finalized.
+    assert _rows(engine) == [
+        (1, 1, 5, 200, 20.0, 200),
+        (1, 1, 6, 150, 30.0, 150),
+        (1, 2, 5, 120, 40.0, 120),
+    ]
+    unique = {i["name"]: i["unique"] for i in inspect(engine).get_indexes("attempts")}
+    assert unique["uq_attempts_device_wand_attempt"]
+
+    assert migrate(engine) == []
+    assert len(_rows(engine)) == 3
+
+
+def test_upsert_updates_the_existing_row(cloud, tmp_path) -> None:
+    engine = _old_database(tmp_path)
+    migrate(engine)
+
+    def values(attempt_id: int, score: float) -> dict:
+        res = cloud.FinalResult(
+            1, 1, attempt_id, attempt_id, 10, 0, 1, 300, "a.png",
+            "explicit_end", "processed", "star_v1", "Star V1", score,
+        )
+        return cloud._attempt_values(res)
+
+    with Session(engine) as db:
+        cloud.upsert_attempts(db, [values(5, 55.0), values(7, 70.0)])
+        db.commit()
+    rows = _rows(engine)
+    assert len(rows) == 4
+    assert rows[0][:5] == (1, 1, 5, 300, 55.0)
+    assert rows[0][5] > 200
+
+    # Dialects without ON CONFLICT take the select-then-write path.
+    with Session(engine) as db:
+        cloud._upsert_attempts_fallback(db, [values(5, 65.0), values(8, 80.0)])
+        db.commit()
+    rows = _rows(engine)
+    assert len(rows) == 5
+    assert rows[0][:5] == (1, 1, 5, 300, 65.0)
+    assert [row[2] for row in rows if row[1] == 1] == [5, 6, 7, 8]